@@ -0,0 +1,77 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+# Helpers shared by the benchmark scripts: latency statistics and result
+# files that can be compared between versions.
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples):
+    """count, mean, min, p50, p95, p99 and max of ``samples``"""
+    values = sorted(samples)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "min": values[0],
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": values[-1],
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """Where and on what the benchmark ran"""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_results(path, kind, settings, results):
+    """Save one benchmark run as JSON"""
+    document = {"benchmark": kind, "environment": environment(), "settings": settings, "results": results}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    print(f"Results written to {path}")
+
+
+def compare(baseline_path, results, metric):
+    """Print ``metric`` of each result next to the same entry of a saved run"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    print(f"\nCompared with {baseline_path} ({metric}):")
+    for name, stats in results.items():
+        before = baseline.get(name, {}).get(metric)
+        after = stats.get(metric)
+        if not before or after is None:
+            print(f"  {name:<32} {'n/a':>12}")
+            continue
+        change = (after - before) / before * 100
+        print(f"  {name:<32} {before:>12.3f} -> {after:>12.3f}  ({change:+.1f}%)")
@@ -0,0 +1,185 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Stand-in for the Ollama HTTP API used by the benchmarks.
+#
+# Answers /api/generate with canned SQL or answer text after a simulated
+# prefill delay (per prompt token) and decode delay (per generated token), so
+# load tests exercise the real request path with reproducible timings and no
+# GPU. /api/tags and /api/ps report the model as installed and loaded, which
+# keeps /health green. Start it and point the API at it:
+#
+#     python -m benchmarks.fake_ollama --port 11500
+#     OLLAMA_BASE_URL=http://localhost:11500 uvicorn main:app
+
+# First matching keyword decides the SQL returned for a question; specific
+# keywords come before the generic "product", which most questions mention
+CANNED_SQL = [
+    (("trend", "over time", "per day", "daily"),
+     "SELECT date, ROUND(SUM(total_sales), 2) AS total_sales FROM total_sales GROUP BY date ORDER BY date;"),
+    (("eligib",),
+     "SELECT eligibility, COUNT(*) AS products FROM eligibility GROUP BY eligibility;"),
+    (("click",),
+     "SELECT clicks FROM ad_sales WHERE clicks > 0;"),
+    (("cpc",),
+     "SELECT item_id, ROUND(SUM(ad_spend) / SUM(clicks), 2) AS cpc FROM ad_sales "
+     "WHERE clicks > 0 GROUP BY item_id ORDER BY cpc DESC LIMIT 1;"),
+    (("roas", "return"),
+     "SELECT ROUND(SUM(ad_sales) / SUM(ad_spend), 2) AS roas FROM ad_sales WHERE ad_spend > 0;"),
+    (("spend", "scatter", "correlation"),
+     "SELECT item_id, ROUND(SUM(ad_spend), 2) AS ad_spend, ROUND(SUM(ad_sales), 2) AS ad_sales "
+     "FROM ad_sales GROUP BY item_id;"),
+    (("top", "product", "best"),
+     "SELECT item_id, ROUND(SUM(total_sales), 2) AS total_sales FROM total_sales "
+     "GROUP BY item_id ORDER BY total_sales DESC LIMIT 10;"),
+]
+DEFAULT_SQL = "SELECT ROUND(SUM(total_sales), 2) AS total_sales FROM total_sales;"
+
+ANSWER = ("Based on the query results, the figures above summarize your store's performance "
+          "for the requested period. The leading entries account for most of the total.")
+
+CHARS_PER_TOKEN = 4
+
+
+def canned_response(prompt):
+    """SQL for SQL-generation prompts, a fixed answer otherwise"""
+    if "SQL analyst" not in prompt:
+        return ANSWER
+    match = re.search(r"^Question: (.*)$", prompt, re.MULTILINE)
+    question = match.group(1).lower() if match else ""
+    for keywords, sql in CANNED_SQL:
+        if any(keyword in question for keyword in keywords):
+            return sql
+    return DEFAULT_SQL
+
+
+class FakeOllama:
+    """Latency model and counters of the fake server"""
+
+    def __init__(self, model, prefill_ms_per_token, decode_ms_per_token, jitter, seed):
+        self.model = model
+        self.prefill_ms_per_token = prefill_ms_per_token
+        self.decode_ms_per_token = decode_ms_per_token
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def _scale(self):
+        with self._lock:
+            self.requests += 1
+            return 1 + self._random.uniform(-self.jitter, self.jitter)
+
+    def generate(self, prompt):
+        """Return (tokens, prompt_tokens, prefill_seconds, seconds_per_token)"""
+        scale = self._scale()
+        text = canned_response(prompt) if prompt else ""
+        tokens = re.findall(r"\S+\s*", text)
+        prompt_tokens = (len(prompt) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+        prefill = prompt_tokens * self.prefill_ms_per_token / 1000 * scale
+        per_token = self.decode_ms_per_token / 1000 * scale
+        return tokens, prompt_tokens, prefill, per_token
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, body, status=200):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._send_json({"models": [{"name": fake.model, "model": fake.model}]})
+            elif self.path == "/api/ps":
+                self._send_json({"models": [{"name": fake.model, "model": fake.model}]})
+            else:
+                self._send_json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            if self.path != "/api/generate":
+                self._send_json({"error": "not found"}, 404)
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            prompt = request.get("prompt", "")
+            tokens, prompt_tokens, prefill, per_token = fake.generate(prompt)
+            final = {
+                "model": fake.model,
+                "done": True,
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(prefill * 1e9),
+                "eval_count": len(tokens),
+                "eval_duration": int(per_token * len(tokens) * 1e9),
+            }
+            time.sleep(prefill)
+
+            if not request.get("stream", True):
+                time.sleep(per_token * len(tokens))
+                self._send_json({**final, "response": "".join(tokens)})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for token in tokens:
+                time.sleep(per_token)
+                self._write_chunk({"model": fake.model, "response": token, "done": False})
+            self._write_chunk({**final, "response": ""})
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _write_chunk(self, body):
+            data = json.dumps(body).encode("utf-8") + b"\n"
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def serve(host="127.0.0.1", port=11500, model="mistral:7b-instruct", prefill_ms_per_token=0.5,
+          decode_ms_per_token=20.0, jitter=0.1, seed=0):
+    """Create the server; call serve_forever() on the result"""
+    fake = FakeOllama(model, prefill_ms_per_token, decode_ms_per_token, jitter, seed)
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    server.fake = fake
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fake Ollama server with canned responses")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11500)
+    parser.add_argument('--model', default='mistral:7b-instruct',
+                        help="model name reported by /api/tags and /api/ps")
+    parser.add_argument('--prefill-ms', type=float, default=0.5,
+                        help="simulated prompt processing time per prompt token")
+    parser.add_argument('--decode-ms', type=float, default=20.0,
+                        help="simulated generation time per output token")
+    parser.add_argument('--jitter', type=float, default=0.1,
+                        help="random +/- fraction applied to each request's latency")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.model, args.prefill_ms, args.decode_ms, args.jitter, args.seed)
+    print(f"Fake Ollama listening on http://{args.host}:{args.port} (model {args.model})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
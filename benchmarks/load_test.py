@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import itertools
+import time
+import httpx
+from benchmarks.common import compare, summarize, write_results
+
+# Load generator for the API.
+#
+# Each scenario sends a fixed number of requests through a fixed number of
+# concurrent workers and reports throughput, latency percentiles, errors and
+# the mean of every Server-Timing stage. Scenarios run one after another so
+# their numbers do not mix. Run against a server backed by
+# benchmarks.fake_ollama for reproducible results:
+#
+#     python -m benchmarks.load_test --requests 200 --concurrency 16 --output run.json
+
+QUESTIONS = [
+    "Show sales trend over time",
+    "Show total sales by product for top 10 products",
+    "Show distribution of ad spend vs ad sales",
+    "Show product eligibility distribution",
+    "Show click distribution across products",
+    "Which product had the highest CPC?",
+]
+
+SCENARIOS = {
+    "ask": ("POST", "/ask", False),
+    "ask_chart": ("POST", "/ask", True),
+    "demo_total_sales": ("GET", "/demo/total-sales", None),
+    "demo_roas": ("GET", "/demo/roas", None),
+    "demo_highest_cpc": ("GET", "/demo/highest-cpc", None),
+}
+
+
+def _parse_server_timing(header):
+    stages = {}
+    for entry in filter(None, (part.strip() for part in (header or "").split(","))):
+        name, _, params = entry.partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                stages[name] = float(value)
+    return stages
+
+
+async def run_scenario(client, name, total, concurrency, unique):
+    method, path, include_chart = SCENARIOS[name]
+    counter = itertools.count()
+    latencies, errors, stages = [], {}, {}
+
+    async def worker():
+        while True:
+            i = next(counter)
+            if i >= total:
+                return
+            json_body = None
+            if method == "POST":
+                question = QUESTIONS[i % len(QUESTIONS)]
+                if unique:
+                    # Distinct text defeats the SQL cache and request coalescing
+                    question = f"{question} (request {i})"
+                json_body = {"question": question, "include_chart": include_chart}
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=json_body)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                response, status = None, type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+            elif response is not None:
+                for stage, ms in _parse_server_timing(response.headers.get("Server-Timing")).items():
+                    # "total" is the whole request, already covered by the latencies
+                    if stage != "total":
+                        stages.setdefault(stage, []).append(ms)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    result = {key: value * 1000 if isinstance(value, float) else value
+              for key, value in summarize(latencies).items()}
+    result.update(
+        throughput_rps=total / elapsed if elapsed else None,
+        elapsed_s=elapsed,
+        errors=errors,
+        stage_mean_ms={stage: sum(v) / len(v) for stage, v in stages.items()}
+    )
+    return result
+
+
+def _print_result(name, result):
+    print(f"{name:<18} {result['throughput_rps']:>8.1f} req/s  "
+          f"p50 {result['p50']:>8.1f} ms  p95 {result['p95']:>8.1f} ms  p99 {result['p99']:>8.1f} ms  "
+          f"errors {sum(result['errors'].values())}")
+    stages = ", ".join(f"{stage} {ms:.1f}" for stage, ms in result["stage_mean_ms"].items())
+    if stages:
+        print(f"{'':<18} stage means (ms): {stages}")
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        for name in args.scenarios:
+            if args.warmup:
+                await run_scenario(client, name, args.warmup, min(args.concurrency, args.warmup), False)
+            results[name] = await run_scenario(client, name, args.requests, args.concurrency, args.unique)
+            _print_result(name, results[name])
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure API throughput and latency under concurrency")
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=100, help="requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=8, help="requests in flight at once")
+    parser.add_argument('--warmup', type=int, default=5, help="unmeasured requests sent first per scenario")
+    parser.add_argument('--unique', action='store_true',
+                        help="make every question distinct so each /ask reaches the LLM")
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--output', metavar='JSON', help="save the results to this file")
+    parser.add_argument('--compare', metavar='JSON', help="print p95 changes against a saved run")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    if args.output:
+        settings = {key: getattr(args, key) for key in ("url", "requests", "concurrency", "warmup", "unique")}
+        write_results(args.output, "load_test", settings, results)
+    if args.compare:
+        compare(args.compare, results, "p95")
@@ -0,0 +1,126 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from benchmarks.common import compare, summarize, write_results
+from charts import chart_cache, generate_chart
+from config import DB_PATH
+from database import DEMO_QUERIES, DatabaseManager
+from llm_service import MistralLLMService
+
+# Micro-benchmarks of the in-process hot spots: query execution (with and
+# without the result cache), SQL extraction from LLM output and chart
+# generation (with and without the chart cache). Timings are in
+# microseconds; save them with --output and pass an older file to --compare
+# to spot regressions between versions.
+#
+#     python -m benchmarks.micro --output micro.json
+
+LLM_RESPONSES = {
+    "plain": "SELECT ROUND(SUM(total_sales), 2) AS total_sales FROM total_sales;",
+    "prefixed": "SQL: SELECT item_id, SUM(ad_spend) / SUM(clicks) AS cpc FROM ad_sales\n"
+                "WHERE clicks > 0 GROUP BY item_id ORDER BY cpc DESC LIMIT 1;",
+    "explained": "Here is the query you asked for:\n\nSELECT date, SUM(total_sales) AS total_sales\n"
+                 "FROM total_sales\nGROUP BY date\nORDER BY date;\n\nThis groups sales by day and "
+                 "returns one row per date, which you can plot as a trend.",
+}
+
+
+def _time(func, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1e6)
+    return summarize(samples)
+
+
+def _chart_frames(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2024-01-01", periods=rows, freq="h").strftime("%Y-%m-%d %H:%M")
+    return {
+        "line": (pd.DataFrame({"date": dates, "total_sales": rng.gamma(2, 50, rows)}),
+                 "Show sales trend over time"),
+        "bar": (pd.DataFrame({"item_id": np.arange(rows), "total_sales": rng.gamma(2, 50, rows)}),
+                "Show total sales by product"),
+        "scatter": (pd.DataFrame({"ad_spend": rng.gamma(2, 10, rows), "ad_sales": rng.gamma(2, 40, rows)}),
+                    "Show ad spend vs ad sales"),
+        "histogram": (pd.DataFrame({"clicks": rng.poisson(12, rows)}), "Show click distribution"),
+    }
+
+
+def _run_query(db, query):
+    """execute_query that fails the benchmark instead of timing a QueryError"""
+    result = db.execute_query(query)
+    if not isinstance(result, pd.DataFrame):
+        raise RuntimeError(f"Query failed ({result.code}): {result.message}\n{query}")
+    return result
+
+
+def bench_execute_query(db_path, repeat):
+    db = DatabaseManager(db_path, pool_size=2, executor_workers=1)
+    results = {}
+    try:
+        for name, query in DEMO_QUERIES.items():
+            results[f"execute_query.{name}.uncached"] = _time(
+                lambda: _run_query(db, query), repeat, setup=db.result_cache.clear
+            )
+            _run_query(db, query)
+            results[f"execute_query.{name}.cached"] = _time(lambda: _run_query(db, query), repeat)
+    finally:
+        db.close()
+    return results
+
+
+def bench_extract_sql(repeat):
+    llm = MistralLLMService()
+    return {
+        f"extract_sql.{name}": _time(lambda: llm._extract_sql_from_response(text), repeat)
+        for name, text in LLM_RESPONSES.items()
+    }
+
+
+def bench_generate_chart(rows, repeat):
+    results = {}
+    for kind, (frame, question) in _chart_frames(rows).items():
+        results[f"generate_chart.{kind}.uncached"] = _time(
+            lambda: generate_chart(frame, question), repeat, setup=chart_cache.clear
+        )
+        results[f"generate_chart.{kind}.cached"] = _time(lambda: generate_chart(frame, question), repeat)
+    return results
+
+
+def _print_results(results):
+    print(f"{'benchmark':<40} {'p50 us':>12} {'p95 us':>12} {'mean us':>12}")
+    for name, stats in results.items():
+        print(f"{name:<40} {stats['p50']:>12.1f} {stats['p95']:>12.1f} {stats['mean']:>12.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of query, SQL extraction and chart code")
+    parser.add_argument('--db', default=DB_PATH, help="database to run the demo queries against")
+    parser.add_argument('--repeat', type=int, default=50, help="timed runs per benchmark")
+    parser.add_argument('--chart-rows', type=int, default=5000, help="rows in the synthetic chart data")
+    parser.add_argument('--only', nargs='+', choices=['execute_query', 'extract_sql', 'generate_chart'],
+                        default=['execute_query', 'extract_sql', 'generate_chart'])
+    parser.add_argument('--output', metavar='JSON', help="save the results to this file")
+    parser.add_argument('--compare', metavar='JSON', help="print p50 changes against a saved run")
+    args = parser.parse_args()
+
+    results = {}
+    if 'execute_query' in args.only:
+        results.update(bench_execute_query(args.db, args.repeat))
+    if 'extract_sql' in args.only:
+        results.update(bench_extract_sql(args.repeat))
+    if 'generate_chart' in args.only:
+        # Chart rendering is much slower than the rest; fewer runs keep it practical
+        results.update(bench_generate_chart(args.chart_rows, max(1, args.repeat // 5)))
+
+    _print_results(results)
+    if args.output:
+        settings = {key: getattr(args, key) for key in ("db", "repeat", "chart_rows")}
+        write_results(args.output, "micro", settings, results)
+    if args.compare:
+        compare(args.compare, results, "p50")
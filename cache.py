@@ -0,0 +1,170 @@
+import asyncio
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_question(question):
+    """Canonical form of a question: lower case, no punctuation, single spaces"""
+    text = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(text.split())
+
+
+class LRUCache:
+    """Thread-safe LRU cache with optional TTL, weight bound and hit/miss counters
+
+    When ``max_weight`` is set, ``weigher(value)`` gives the cost of each entry
+    (for example its size in bytes) and least recently used entries are evicted
+    until the total fits.
+    """
+
+    def __init__(self, max_size=256, ttl=None, max_weight=None, weigher=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self.weigher = weigher
+        self._data = OrderedDict()
+        self._weight = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return default
+            value, expires_at, weight = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self._weight -= weight
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        weight = self.weigher(value) if self.weigher else 0
+        if self.max_weight is not None and weight > self.max_weight:
+            return False
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._weight -= previous[2]
+            self._data[key] = (value, expires_at, weight)
+            self._weight += weight
+            while len(self._data) > self.max_size or (
+                self.max_weight is not None and self._weight > self.max_weight
+            ):
+                _, evicted = self._data.popitem(last=False)
+                self._weight -= evicted[2]
+                self._stats["evictions"] += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._weight = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._data)
+            stats["weight"] = self._weight
+        stats["max_size"] = self.max_size
+        stats["max_weight"] = self.max_weight
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution (threads)
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight wait for it and receive the same result or exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {"executions": 0, "coalesced": 0}
+
+    def run(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["executions"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        return stats
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight
+
+    The shared computation runs as its own task, so a caller that disconnects
+    does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self._stats = {"executions": 0, "coalesced": 0}
+
+    async def run(self, key, coro_factory):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self._stats["executions"] += 1
+        else:
+            self._stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._tasks)
+        return stats
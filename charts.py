@@ -0,0 +1,229 @@
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+from cache import LRUCache
+from config import CHART_MAX_POINTS, CHART_MAX_BARS, CHART_CACHE_SIZE
+
+# Plotly chart generation for query results.
+#
+# plotly is imported on first use rather than at API startup, and every chart
+# is reduced before serialization: line charts with LTTB, bar charts to the
+# top categories plus an "Other" bucket, scatter plots to a sample and
+# histograms to pre-computed bins. The JSON payload therefore stays small no
+# matter how many rows the query returned.
+
+logger = logging.getLogger(__name__)
+
+# (result fingerprint, question) -> (chart JSON, chart type)
+chart_cache = LRUCache(max_size=CHART_CACHE_SIZE)
+
+_plotly_express = None
+
+
+def _px():
+    global _plotly_express
+    if _plotly_express is None:
+        import plotly.express as px
+        _plotly_express = px
+    return _plotly_express
+
+
+def _has_statsmodels():
+    try:
+        import statsmodels  # noqa: F401 - needed by plotly's OLS trendline
+        return True
+    except ImportError:
+        return False
+
+
+def result_fingerprint(data):
+    """Stable digest of a DataFrame's columns, dtypes and values"""
+    digest = hashlib.sha1()
+    digest.update(repr([(str(c), str(t)) for c, t in data.dtypes.items()]).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(data, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def lttb(x, y, threshold):
+    """Indices of the points kept by Largest-Triangle-Three-Buckets downsampling
+
+    Keeps the first and last points and, for each of ``threshold - 2``
+    buckets, the point forming the largest triangle with the previously kept
+    point and the average of the next bucket. Peaks and troughs survive,
+    unlike with plain striding.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+
+    kept = [0]
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.nanargmax(area)) if np.isfinite(area).any() else start
+        kept.append(previous)
+    kept.append(n - 1)
+    return np.array(kept)
+
+
+def downsample_line(data, x_col, y_col, max_points=CHART_MAX_POINTS):
+    """Reduce a series to ``max_points`` points with LTTB"""
+    if len(data) <= max_points:
+        return data
+    data = data.sort_values(x_col)
+    x = pd.to_datetime(data[x_col], errors="coerce")
+    x = x.astype("int64") if x.notna().all() else pd.Series(np.arange(len(data)))
+    y = pd.to_numeric(data[y_col], errors="coerce").fillna(0)
+    return data.iloc[lttb(x.values, y.values, max_points)]
+
+
+def top_n_with_other(data, label_col, value_col, max_bars=CHART_MAX_BARS, other_label="Other", sort_all=False):
+    """Largest ``max_bars - 1`` rows by value plus one row summing the rest
+
+    Results that fit are returned in their own order, or sorted by value
+    with ``sort_all``.
+    """
+    if not pd.api.types.is_numeric_dtype(data[value_col]):
+        return data
+    if len(data) <= max_bars and not sort_all:
+        return data
+    data = data[[label_col, value_col]].copy()
+    # String labels keep plotly from re-ordering numeric ids along the axis
+    data[label_col] = data[label_col].astype(str)
+    ordered = data.sort_values(value_col, ascending=False)
+    if len(ordered) <= max_bars:
+        return ordered
+    top = ordered.head(max_bars - 1)
+    other = pd.DataFrame({label_col: [other_label], value_col: [ordered[value_col].iloc[max_bars - 1:].sum()]})
+    return pd.concat([top, other], ignore_index=True)
+
+
+def generate_chart(data, question):
+    """Generate appropriate chart based on query results; cached per result and question"""
+    if data.empty:
+        return None, None
+    key = (result_fingerprint(data), question)
+    cached = chart_cache.get(key)
+    if cached is not None:
+        return cached
+    chart = _build_chart(data, question)
+    if chart[0] is not None:
+        chart_cache.set(key, chart)
+    return chart
+
+
+def _build_chart(data, question):
+    try:
+        px = _px()
+        question_lower = question.lower()
+
+        # Determine chart type based on question and data
+        if len(data.columns) >= 2:
+
+            # Time series data (line chart)
+            if 'date' in data.columns or any('time' in col.lower() for col in data.columns):
+                date_col = 'date' if 'date' in data.columns else [col for col in data.columns if 'time' in col.lower()][0]
+                value_col = [col for col in data.columns if col != date_col][0]
+                line_data = downsample_line(data, date_col, value_col)
+
+                fig = px.line(
+                    line_data,
+                    x=date_col,
+                    y=value_col,
+                    title=f"Trend Analysis: {question}",
+                    markers=True
+                )
+                return fig.to_json(), "line"
+
+            # Sales by product (bar chart)
+            elif 'item_id' in data.columns and any('sales' in col.lower() for col in data.columns):
+                item_col = 'item_id'
+                value_col = [col for col in data.columns if 'sales' in col.lower()][0]
+
+                # Top 10 for readability, with the remaining products summed
+                # into an 11th "Other" bar
+                top_data = top_n_with_other(data, item_col, value_col, max_bars=11, sort_all=True)
+
+                fig = px.bar(
+                    top_data,
+                    x=item_col,
+                    y=value_col,
+                    title=f"Top Products: {question}",
+                    text=value_col
+                )
+                fig.update_traces(texttemplate='%{text:.2s}', textposition='outside')
+                fig.update_xaxes(type='category')
+                return fig.to_json(), "bar"
+
+            # Pie chart for categorical data with percentages
+            elif len(data) <= 10 and 'eligibility' in question_lower:
+                # For eligibility data
+                if 'eligibility' in data.columns:
+                    fig = px.pie(
+                        data,
+                        names='eligibility',
+                        values=data.columns[1] if len(data.columns) > 1 else 'count',
+                        title=f"Distribution: {question}"
+                    )
+                    return fig.to_json(), "pie"
+
+            # Scatter plot for correlation analysis
+            elif 'spend' in question_lower and 'sales' in question_lower:
+                x_col = [col for col in data.columns if 'spend' in col.lower()][0]
+                y_col = [col for col in data.columns if 'sales' in col.lower()][0]
+                points = data.sample(CHART_MAX_POINTS, random_state=0) if len(data) > CHART_MAX_POINTS else data
+
+                fig = px.scatter(
+                    points,
+                    x=x_col,
+                    y=y_col,
+                    title=f"Correlation Analysis: {question}",
+                    trendline="ols" if _has_statsmodels() else None
+                )
+                return fig.to_json(), "scatter"
+
+            # Default bar chart
+            else:
+                bar_data = top_n_with_other(data, data.columns[0], data.columns[1])
+                fig = px.bar(
+                    bar_data,
+                    x=data.columns[0],
+                    y=data.columns[1],
+                    title=f"Analysis: {question}"
+                )
+                return fig.to_json(), "bar"
+
+        # Single column data (histogram)
+        elif len(data.columns) == 1:
+            column = data.columns[0]
+            values = pd.to_numeric(data[column], errors="coerce").dropna()
+            if len(values) <= CHART_MAX_POINTS or len(values) != len(data):
+                fig = px.histogram(
+                    data,
+                    x=column,
+                    title=f"Distribution: {question}",
+                    nbins=20
+                )
+            else:
+                # Bin server-side so the payload carries 20 bars, not every value
+                counts, edges = np.histogram(values, bins=20)
+                bins = pd.DataFrame({column: (edges[:-1] + edges[1:]) / 2, "count": counts})
+                fig = px.bar(bins, x=column, y="count", title=f"Distribution: {question}")
+                fig.update_traces(width=float(edges[1] - edges[0]))
+            return fig.to_json(), "histogram"
+
+        return None, None
+    except Exception as e:
+        logger.warning("Error generating chart: %s", e)
+        return None, None
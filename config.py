@@ -0,0 +1,100 @@
+import os
+
+# Runtime settings, overridable through environment variables
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_float(name, default):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+DB_PATH = os.getenv("DB_PATH", "ecommerce_data.db")
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 8)
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral:7b-instruct")
+OLLAMA_TIMEOUT = _env_float("OLLAMA_TIMEOUT", 60.0)
+# How long Ollama keeps the model loaded after a request (Ollama duration string)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Load the model into memory while the API starts instead of on the first question
+OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "1").lower() not in ("0", "false", "no")
+# Seconds the /health probe waits for Ollama
+OLLAMA_HEALTH_TIMEOUT = _env_float("OLLAMA_HEALTH_TIMEOUT", 2.0)
+
+# Maximum number of /ask requests processed at the same time
+ASK_MAX_CONCURRENCY = _env_int("ASK_MAX_CONCURRENCY", 8)
+# Maximum number of generate calls sent to Ollama at the same time
+LLM_MAX_CONCURRENCY = _env_int("LLM_MAX_CONCURRENCY", 4)
+# Questions from one /ask/batch request processed at the same time
+BATCH_MAX_CONCURRENCY = _env_int("BATCH_MAX_CONCURRENCY", LLM_MAX_CONCURRENCY)
+# Largest accepted /ask/batch request
+BATCH_MAX_QUESTIONS = _env_int("BATCH_MAX_QUESTIONS", 100)
+# Worker threads running blocking SQLite calls
+DB_EXECUTOR_WORKERS = _env_int("DB_EXECUTOR_WORKERS", DB_POOL_SIZE)
+
+# Query result cache, bounded by entry count and approximate DataFrame memory
+RESULT_CACHE_SIZE = _env_int("RESULT_CACHE_SIZE", 512)
+RESULT_CACHE_MAX_BYTES = _env_int("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+
+# Answer matching aggregate queries from the rollup tables built at ingest
+ROLLUP_ROUTING = os.getenv("ROLLUP_ROUTING", "1").lower() not in ("0", "false", "no")
+
+# Answer recognised metric questions (total sales, RoAS, CPC, CTR, units...)
+# from SQL templates instead of the LLM
+INTENT_FAST_PATH = os.getenv("INTENT_FAST_PATH", "1").lower() not in ("0", "false", "no")
+
+# Question -> SQL cache (entries also expire when the database file changes)
+SQL_CACHE_SIZE = _env_int("SQL_CACHE_SIZE", 256)
+SQL_CACHE_TTL = _env_float("SQL_CACHE_TTL", 3600.0)
+
+# Approximate token budget for SQL generation prompts; the schema section is
+# trimmed to the tables and columns relevant to the question to stay within it
+PROMPT_TOKEN_BUDGET = _env_int("PROMPT_TOKEN_BUDGET", 1024)
+PROMPT_SCHEMA_PRUNING = os.getenv("PROMPT_SCHEMA_PRUNING", "1").lower() not in ("0", "false", "no")
+
+# Rows fetched for an answer; larger results are paged through /results/{query_id}
+RESULT_MAX_ROWS = _env_int("RESULT_MAX_ROWS", 1000)
+# Largest page served by /results/{query_id}
+RESULT_PAGE_MAX = _env_int("RESULT_PAGE_MAX", 1000)
+# Queries kept available for paging, and for how long (seconds)
+RESULT_HANDLE_CACHE_SIZE = _env_int("RESULT_HANDLE_CACHE_SIZE", 256)
+RESULT_HANDLE_TTL = _env_float("RESULT_HANDLE_TTL", 3600.0)
+# Rows and characters of a result passed to the answer-formatting prompt
+RESULT_SUMMARY_ROWS = _env_int("RESULT_SUMMARY_ROWS", 20)
+RESULT_SUMMARY_MAX_CHARS = _env_int("RESULT_SUMMARY_MAX_CHARS", 4000)
+
+# Guard limits for every executed query: wall-clock seconds, rows fetched and
+# estimated row combinations of a join between full table scans
+QUERY_TIMEOUT = _env_float("QUERY_TIMEOUT", 10.0)
+QUERY_MAX_ROWS = _env_int("QUERY_MAX_ROWS", 100_000)
+QUERY_MAX_JOIN_SCAN_ROWS = _env_int("QUERY_MAX_JOIN_SCAN_ROWS", 1_000_000)
+
+# Compile generated SQL before running it and send errors back to the LLM for
+# at most SQL_REPAIR_ATTEMPTS corrections
+SQL_VALIDATION = os.getenv("SQL_VALIDATION", "1").lower() not in ("0", "false", "no")
+SQL_REPAIR_ATTEMPTS = _env_int("SQL_REPAIR_ATTEMPTS", 2)
+
+# Chart payload limits: points per line/scatter chart, bars per bar chart, and
+# rendered charts kept in memory
+CHART_MAX_POINTS = _env_int("CHART_MAX_POINTS", 500)
+CHART_MAX_BARS = _env_int("CHART_MAX_BARS", 20)
+CHART_CACHE_SIZE = _env_int("CHART_CACHE_SIZE", 128)
+
+# Logging: level, "text" or "json" lines, optional log file, and the stages
+# whose payloads (prompts, SQL, rows...) are logged at DEBUG level
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_FILE = os.getenv("LOG_FILE", "demo.log")
+LOG_PAYLOADS = {
+    stage.strip() for stage in
+    os.getenv("LOG_PAYLOADS", "schema,prompt,llm_response,sql,rows,answer").split(",")
+    if stage.strip()
+}
+
+# Latency samples kept per stage for the p50/p95/p99 quantiles on /metrics
+METRICS_WINDOW = _env_int("METRICS_WINDOW", 1024)
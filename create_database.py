@@ -1,49 +1,513 @@
 import pandas as pd
-import sqlite3
 import os
+import argparse
+import hashlib
+import time
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from database import DEMO_QUERIES
+from rollups import RollupRouter, build_rollups
+from eligibility_state import CURRENT_TABLE, refresh_eligibility_state
+from synthetic_data import generate as generate_synthetic
+
+DB_FILE = 'ecommerce_data.db'
+
+# Your CSV file names (adjust these to match your actual files)
+AD_SALES_CSV = 'Product-Level Ad Sales and Metrics (mapped) - Product-Level Ad Sales and Metrics (mapped).csv'
+TOTAL_SALES_CSV = 'Product-Level Total Sales and Metrics (mapped) - Product-Level Total Sales and Metrics (mapped).csv'
+ELIGIBILITY_CSV = 'Product-Level Eligibility Table (mapped) - Product-Level Eligibility Table (mapped).csv'
+
+# Directories searched for the CSV files, in order
+CSV_DIRS = ['.', 'data']
+
+# Column types and natural key of each table; the key identifies a row when
+# a later export restates it
+TABLES = {
+    'ad_sales': {
+        'columns': [('date', 'TEXT'), ('item_id', 'INTEGER'), ('ad_sales', 'REAL'),
+                    ('impressions', 'INTEGER'), ('ad_spend', 'REAL'), ('clicks', 'INTEGER'),
+                    ('units_sold', 'INTEGER')],
+        'key': ('item_id', 'date'),
+    },
+    'total_sales': {
+        'columns': [('date', 'TEXT'), ('item_id', 'INTEGER'), ('total_sales', 'REAL'),
+                    ('total_units_ordered', 'INTEGER')],
+        'key': ('item_id', 'date'),
+    },
+    'eligibility': {
+        'columns': [('eligibility_datetime_utc', 'TEXT'), ('item_id', 'INTEGER'),
+                    ('eligibility', 'INTEGER'), ('message', 'TEXT')],
+        'key': ('item_id', 'eligibility_datetime_utc'),
+    },
+}
+
+# (index name, table, columns, unique)
+INDEXES = [
+    ('idx_ad_sales_item_date', 'ad_sales', ('item_id', 'date'), True),
+    ('idx_ad_sales_date', 'ad_sales', ('date',), False),
+    ('idx_total_sales_item_date', 'total_sales', ('item_id', 'date'), True),
+    ('idx_total_sales_date', 'total_sales', ('date',), False),
+    ('idx_eligibility_item_datetime', 'eligibility_checks', ('item_id', 'eligibility_datetime_utc'), True),
+]
+
+# Columns stored as integer ids into a lookup table:
+# table -> (column, lookup table, storage table). The rows live in the
+# storage table and a view named after the table restores the CSV column
+# set, so SQL written against the original table keeps working.
+DICTIONARY_COLUMNS = {
+    'eligibility': ('message', 'eligibility_messages', 'eligibility_checks'),
+}
+
+# Timestamp columns and the ISO-8601 form they are stored in. The exports
+# write "2025-06-04 8:50:07", which sorts "10:00" before "8:50"; zero-padded
+# ISO text sorts and compares like the instant it names, and existing SQL
+# comparing against '2025-06-01' literals keeps working.
+TIMESTAMP_FORMATS = {
+    'date': '%Y-%m-%d',
+    'eligibility_datetime_utc': '%Y-%m-%d %H:%M:%S',
+}
+
+# STRICT tables reject values that do not match the declared column type
+STRICT_TABLES = sqlite3.sqlite_version_info >= (3, 37, 0)
+
+# Pragmas of the connection that builds a fresh database file. Nothing reads
+# the file until it is complete, and a crashed build is simply discarded, so
+# journaling and fsyncs buy nothing.
+BUILD_PRAGMAS = [
+    "PRAGMA journal_mode=OFF",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-262144",
+]
+
+MANIFEST_DDL = """
+CREATE TABLE IF NOT EXISTS ingest_manifest (
+    sha256 TEXT PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    ingested_at TEXT NOT NULL
+)
+"""
+
+# Extra queries whose plans show the join and date-range indexes at work
+EXPLAIN_QUERIES = {
+    "ad-vs-total-join": """
+    SELECT a.item_id, SUM(a.ad_sales) AS ad_sales, SUM(t.total_sales) AS total_sales
+    FROM ad_sales a
+    JOIN total_sales t ON t.item_id = a.item_id AND t.date = a.date
+    GROUP BY a.item_id;
+    """,
+    "date-range": "SELECT date, SUM(total_sales) FROM total_sales WHERE date BETWEEN '2025-06-01' AND '2025-06-07' AND total_sales > 100 GROUP BY date;",
+    "current-eligibility": "SELECT item_id, message FROM eligibility_current WHERE eligibility = 0;",
+    "latest-eligibility": """
+    SELECT e.item_id, e.eligibility FROM eligibility e
+    WHERE e.eligibility_datetime_utc = (
+        SELECT MAX(eligibility_datetime_utc) FROM eligibility WHERE item_id = e.item_id
+    );
+    """,
+}
+
+
+def find_csv(file_name, csv_dirs=CSV_DIRS):
+    """Path of a CSV file in one of ``csv_dirs``, or None"""
+    for directory in csv_dirs:
+        path = os.path.join(directory, file_name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def build_indexes(conn, analyze=True):
+    """Create lookup/join indexes and, with ``analyze``, refresh the planner statistics"""
+    for name, table, columns, unique in INDEXES:
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        conn.execute(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+    if analyze:
+        conn.execute("ANALYZE")
+    conn.commit()
+    return [name for name, _, _, _ in INDEXES]
+
+
+def file_sha256(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def record_manifest(conn, path, sha256, table, row_count):
+    conn.execute(MANIFEST_DDL)
+    conn.execute(
+        "INSERT OR REPLACE INTO ingest_manifest VALUES (?, ?, ?, ?, ?)",
+        (sha256, os.path.basename(path), table, row_count, datetime.utcnow().isoformat(timespec='seconds'))
+    )
+
+
+def detect_table(columns):
+    """Target table for a CSV, recognised by its header"""
+    for table, spec in TABLES.items():
+        if [name for name, _ in spec['columns']] == list(columns):
+            return table
+    return None
 
-def create_database():
-    # Your CSV file names (adjust these to match your actual files)
-    ad_sales_csv = 'Product-Level Ad Sales and Metrics (mapped) - Product-Level Ad Sales and Metrics (mapped).csv'
-    total_sales_csv = 'Product-Level Total Sales and Metrics (mapped) - Product-Level Total Sales and Metrics (mapped).csv'
-    eligibility_csv = 'Product-Level Eligibility Table (mapped) - Product-Level Eligibility Table (mapped).csv'
+
+def storage_table(table):
+    """Name of the table that physically holds the rows of ``table``"""
+    return DICTIONARY_COLUMNS[table][2] if table in DICTIONARY_COLUMNS else table
+
+
+def storage_columns(table):
+    """(name, type) of the stored columns; dictionary-encoded columns hold ``<column>_id``"""
+    encoded = DICTIONARY_COLUMNS[table][0] if table in DICTIONARY_COLUMNS else None
+    return [
+        (f"{name}_id", 'INTEGER') if name == encoded else (name, kind)
+        for name, kind in TABLES[table]['columns']
+    ]
+
+
+def table_ddl(table, if_not_exists=False):
+    """CREATE statements for ``table`` with its declared column types
+    
+    A dictionary-encoded table gets its lookup table, its storage table and
+    the view in front of them.
+    """
+    exists = "IF NOT EXISTS " if if_not_exists else ""
+    strict = " STRICT" if STRICT_TABLES else ""
+    columns = ", ".join(f"{name} {kind}" for name, kind in storage_columns(table))
+    statements = [f"CREATE TABLE {exists}{storage_table(table)} ({columns}){strict}"]
+    if table in DICTIONARY_COLUMNS:
+        column, lookup, storage = DICTIONARY_COLUMNS[table]
+        statements.insert(0, (
+            f"CREATE TABLE {exists}{lookup} "
+            f"({column}_id INTEGER PRIMARY KEY, {column} TEXT NOT NULL UNIQUE){strict}"
+        ))
+        # A scalar subquery rather than a join: queries that do not select
+        # the column never touch the lookup table
+        select = ", ".join(
+            f"(SELECT {column} FROM {lookup} WHERE {lookup}.{column}_id = {storage}.{column}_id) AS {column}"
+            if name == column else name
+            for name, _ in TABLES[table]['columns']
+        )
+        statements.append(f"CREATE VIEW {exists}{table} AS SELECT {select} FROM {storage}")
+    return statements
+
+
+def normalize_frame(table, df):
+    """Convert a CSV frame to the stored representation of ``table``"""
+    for column, fmt in TIMESTAMP_FORMATS.items():
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column]).dt.strftime(fmt)
+    if table == 'eligibility':
+        df['eligibility'] = df['eligibility'].map(
+            {True: 1, False: 0, 'TRUE': 1, 'FALSE': 0, 'True': 1, 'False': 0}
+        )
+    return df
+
+
+def _frame_rows(df):
+    """Rows of a DataFrame as plain Python tuples ready for sqlite3"""
+    df = df.astype(object).where(df.notna(), None)
+    return list(df.itertuples(index=False, name=None))
+
+
+def encode_dictionary(conn, table, df):
+    """Replace the dictionary-encoded column of ``df`` by ids into its lookup table
+    
+    Values not yet in the lookup table are added to it.
+    """
+    if table not in DICTIONARY_COLUMNS:
+        return df
+    column, lookup, _ = DICTIONARY_COLUMNS[table]
+    conn.executemany(
+        f"INSERT OR IGNORE INTO {lookup} ({column}) VALUES (?)",
+        [(value,) for value in df[column].dropna().unique().tolist()]
+    )
+    # Low cardinality is the point of the encoding, so the whole lookup fits in memory
+    ids = dict(conn.execute(f"SELECT {column}, {column}_id FROM {lookup}"))
+    df[column] = df[column].map(ids)
+    return df.rename(columns={column: f"{column}_id"})
+
+
+def _note_touched(touched, chunk):
+    """Fold the earliest snapshot time per item of an eligibility chunk into ``touched``"""
+    chunk = chunk.dropna(subset=['item_id', 'eligibility_datetime_utc'])
+    for item_id, since in chunk.groupby('item_id')['eligibility_datetime_utc'].min().items():
+        item_id = int(item_id)
+        touched[item_id] = min(since, touched.get(item_id, since))
+
+
+def _insert_sql(table):
+    columns = [name for name, _ in storage_columns(table)]
+    return (
+        f"INSERT INTO {storage_table(table)} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))})"
+    )
+
+
+def _upsert_sql(table):
+    spec = TABLES[table]
+    columns = [name for name, _ in storage_columns(table)]
+    updates = [c for c in columns if c not in spec['key']]
+    return (
+        f"INSERT INTO {storage_table(table)} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT ({', '.join(spec['key'])}) DO UPDATE SET "
+        + ", ".join(f"{c} = excluded.{c}" for c in updates)
+    )
+
+
+def ingest_incremental(paths, chunksize=50_000, db_path=DB_FILE):
+    """Stream CSV exports into the database, upserting on each table's natural key
+    
+    Files whose SHA-256 is already in ingest_manifest are skipped, so re-running
+    over the same exports costs one hash per file. Each file is loaded in its
+    own transaction together with its manifest row. Rollups and eligibility
+    state are refreshed afterwards for every committed file, also when a
+    later file fails.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        legacy = [
+            table for table in DICTIONARY_COLUMNS
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+        ]
+        if legacy:
+            print(f"❌ {legacy} predate dictionary encoding; rebuild with: python create_database.py")
+            return False
+        for table in TABLES:
+            for statement in table_ddl(table, if_not_exists=True):
+                conn.execute(statement)
+        conn.execute(MANIFEST_DDL)
+        # Statistics are refreshed below, and only if a file was loaded
+        build_indexes(conn, analyze=False)
+        # Databases built before the eligibility state tables get them in full
+        state_missing = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (CURRENT_TABLE,)
+        ).fetchone() is None
+        
+        changed = False
+        touched = {}
+        try:
+            for path in paths:
+                sha256 = file_sha256(path)
+                if conn.execute("SELECT 1 FROM ingest_manifest WHERE sha256 = ?", (sha256,)).fetchone():
+                    print(f"⏭️ {os.path.basename(path)}: already ingested")
+                    continue
+                
+                header = pd.read_csv(path, nrows=0).columns
+                table = detect_table(header)
+                if table is None:
+                    print(f"❌ {os.path.basename(path)}: unrecognised columns {list(header)}")
+                    continue
+                
+                sql = _upsert_sql(table)
+                row_count = 0
+                with conn:
+                    for chunk in pd.read_csv(path, chunksize=chunksize):
+                        chunk = normalize_frame(table, chunk)
+                        if table == 'eligibility':
+                            _note_touched(touched, chunk)
+                        rows = _frame_rows(encode_dictionary(conn, table, chunk))
+                        conn.executemany(sql, rows)
+                        row_count += len(rows)
+                    record_manifest(conn, path, sha256, table, row_count)
+                changed = True
+                print(f"✅ {os.path.basename(path)} -> {table}: {row_count} rows upserted")
+        finally:
+            # Files committed before a failure are already in the manifest and
+            # are skipped on the next run, so refresh the derived tables for
+            # whatever made it in
+            if state_missing or touched:
+                refreshed = refresh_eligibility_state(conn, None if state_missing else touched)
+                print(f"✅ Current eligibility refreshed for {refreshed} items")
+            if changed:
+                print("📊 Refreshing rollups and statistics...")
+                build_rollups(conn)
+                conn.execute("ANALYZE")
+                conn.commit()
+        conn.execute("PRAGMA journal_mode=WAL;")
+        return True
+    except Exception as e:
+        print(f"❌ Error during incremental ingest: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def explain_queries(db_path=DB_FILE):
+    """Print EXPLAIN QUERY PLAN for the demo queries (and their rollup rewrites)"""
+    if not os.path.exists(db_path):
+        print(f"❌ Database '{db_path}' not found. Run create_database.py first.")
+        return False
+    
+    conn = sqlite3.connect(db_path)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+    router = RollupRouter()
+    
+    for name, query in {**DEMO_QUERIES, **EXPLAIN_QUERIES}.items():
+        print(f"\n🔎 {name}")
+        print(f"   {' '.join(query.split())}")
+        _print_plan(conn, query)
+        routed = router.route(query, tables)
+        if routed:
+            print(f"   ↪ routed to {routed[1]}:")
+            _print_plan(conn, routed[0])
+    
+    conn.close()
+    return True
+
+
+def _print_plan(conn, query):
+    try:
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+    except sqlite3.Error as e:
+        # e.g. a table added by a newer version of this script
+        print(f"    ⚠️ {e}")
+        return
+    for _, parent, _, detail in plan:
+        indent = "      " if parent else "    "
+        print(f"{indent}{detail}")
+
+def generate_scaled_csvs(out_dir, scale, days_scale=1, seed=0):
+    """Write synthetic CSVs ``scale`` times the items (and ``days_scale`` times the days) of the real ones"""
+    sources = {
+        find_csv(AD_SALES_CSV): 'date',
+        find_csv(TOTAL_SALES_CSV): 'date',
+        find_csv(ELIGIBILITY_CSV): 'eligibility_datetime_utc',
+    }
+    if None in sources:
+        print("❌ The source CSV files are needed to derive synthetic data from.")
+        return False
+    print(f"🧬 Generating {scale}x items, {days_scale}x days into {out_dir}...")
+    for path, rows in generate_synthetic(sources, out_dir, scale=scale, days_scale=days_scale, seed=seed).items():
+        print(f"✅ {os.path.basename(path)}: {rows:,} rows")
+    return True
+
+
+def _read_csv(table, path):
+    """Parse, normalize and de-duplicate one CSV; runs in a worker process
+
+    Returns (DataFrame, SHA-256 of the file).
+    """
+    df = normalize_frame(table, pd.read_csv(path))
+    # A restated row appears again later in the export; the last one wins
+    df = df.drop_duplicates(list(TABLES[table]['key']), keep='last')
+    return df, file_sha256(path)
+
+
+def _remove_database_files(path):
+    for suffix in ('', '-journal', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def _checkpoint(db_path):
+    """Fold the WAL of an existing database back into it before it is replaced
+
+    Connections opened on the new file would otherwise find the old file's
+    -wal next to it and try to replay it. Best effort: readers still holding
+    old snapshots can keep the checkpoint from truncating the log.
+    """
+    if not os.path.exists(db_path):
+        return
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+
+def bulk_load(sources, db_path=DB_FILE, batch_size=100_000, workers=None):
+    """Build a new database from {table: CSV path} and swap it into ``db_path``
+
+    The CSVs are parsed in parallel processes and inserted with executemany,
+    one transaction per table, into ``<db_path>.building`` with journaling
+    and fsync off. Indexes, rollups, statistics and the ingest manifest are
+    built once all rows are in, the file is switched to WAL and then renamed
+    over ``db_path``, so readers see either the old or the finished database.
+    Returns {table: row count}.
+    """
+    build_path = f"{db_path}.building"
+    _remove_database_files(build_path)
+    conn = sqlite3.connect(build_path)
+    try:
+        for pragma in BUILD_PRAGMAS:
+            conn.execute(pragma)
+        for table in sources:
+            for statement in table_ddl(table):
+                conn.execute(statement)
+
+        counts = {}
+        with ProcessPoolExecutor(max_workers=workers or len(sources)) as pool:
+            futures = {pool.submit(_read_csv, table, path): table for table, path in sources.items()}
+            # Insert each table as soon as it is parsed, while the others are still being read
+            for future in as_completed(futures):
+                table = futures[future]
+                df, sha256 = future.result()
+                df = encode_dictionary(conn, table, df)
+                sql = _insert_sql(table)
+                for start in range(0, len(df), batch_size):
+                    conn.executemany(sql, _frame_rows(df.iloc[start:start + batch_size]))
+                record_manifest(conn, sources[table], sha256, table, len(df))
+                conn.commit()
+                counts[table] = len(df)
+                print(f"✅ {table}: {len(df):,} rows")
+
+        print("🗂️ Building indexes...")
+        print(f"✅ Indexes built: {build_indexes(conn, analyze=False)}")
+        # Pre-aggregate the fact tables so KPI queries skip full scans
+        print("📊 Building rollup tables...")
+        print(f"✅ Rollups built: {build_rollups(conn)}")
+        if 'eligibility' in sources:
+            print(f"✅ Current eligibility for {refresh_eligibility_state(conn)} items")
+        conn.execute("ANALYZE")
+        conn.commit()
+
+        # WAL lets the API's pooled read-only connections read concurrently
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.close()
+    except BaseException:
+        conn.close()
+        _remove_database_files(build_path)
+        raise
+
+    _checkpoint(db_path)
+    os.replace(build_path, db_path)
+    return counts
+
+
+def create_database(csv_dirs=CSV_DIRS, db_path=DB_FILE):
+    sources = {
+        'total_sales': find_csv(TOTAL_SALES_CSV, csv_dirs),
+        'ad_sales': find_csv(AD_SALES_CSV, csv_dirs),
+        'eligibility': find_csv(ELIGIBILITY_CSV, csv_dirs),
+    }
     
     # Check if files exist
-    files = [total_sales_csv, ad_sales_csv, eligibility_csv]
-    missing_files = [f for f in files if not os.path.exists(f)]
+    names = {'total_sales': TOTAL_SALES_CSV, 'ad_sales': AD_SALES_CSV, 'eligibility': ELIGIBILITY_CSV}
+    missing_files = [names[table] for table, path in sources.items() if path is None]
     
     if missing_files:
         print(f"❌ Missing files: {missing_files}")
-        print("Make sure these CSV files are in the same directory as this script.")
+        print(f"Make sure these CSV files are in one of: {', '.join(csv_dirs)}")
         return False
     
     try:
-        # Create database connection
-        conn = sqlite3.connect('ecommerce_data.db')
-        
-        print("📖 Reading CSV files...")
-        
-        # Read CSV files
-        total_sales_df = pd.read_csv(total_sales_csv)
-        ad_sales_df = pd.read_csv(ad_sales_csv) 
-        eligibility_df = pd.read_csv(eligibility_csv)
+        print("📖 Loading CSV files...")
+        started = time.perf_counter()
+        bulk_load(sources, db_path)
+        print(f"⏱️ Built in {time.perf_counter() - started:.1f}s")
         
-        print(f"✅ Total Sales data: {len(total_sales_df)} rows")
-        print(f"✅ Ad Sales data: {len(ad_sales_df)} rows")
-        print(f"✅ Eligibility data: {len(eligibility_df)} rows")
-        
-        # Create tables
-        print("💾 Creating database tables...")
-        total_sales_df.to_sql('total_sales', conn, if_exists='replace', index=False)
-        ad_sales_df.to_sql('ad_sales', conn, if_exists='replace', index=False)
-        eligibility_df.to_sql('eligibility', conn, if_exists='replace', index=False)
+        conn = sqlite3.connect(db_path)
         
         # Verify tables were created
         cursor = conn.cursor()
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
         tables = cursor.fetchall()
         
-        print(f"✅ Database 'ecommerce_data.db' created successfully!")
+        print(f"✅ Database '{db_path}' created successfully!")
         print(f"📋 Tables created: {[table[0] for table in tables]}")
         
         # Test sample queries
@@ -76,7 +540,42 @@ def create_database():
         return False
 
 if __name__ == '__main__':
-    success = create_database()
+    parser = argparse.ArgumentParser(description="Load the e-commerce CSVs into SQLite")
+    parser.add_argument('--explain', action='store_true',
+                        help="print EXPLAIN QUERY PLAN for the demo queries against the existing database and exit")
+    parser.add_argument('--incremental', nargs='*', metavar='CSV',
+                        help="upsert new/changed CSV exports (default: the three standard CSVs) instead of rebuilding")
+    parser.add_argument('--chunksize', type=int, default=50_000,
+                        help="rows read per chunk in --incremental mode")
+    parser.add_argument('--scale', type=int, metavar='N',
+                        help="build from synthetic data with N times the items of the real CSVs")
+    parser.add_argument('--days-scale', type=int, default=1, metavar='N',
+                        help="with --scale, also repeat the calendar N times")
+    parser.add_argument('--seed', type=int, default=0, help="random seed of the synthetic data")
+    parser.add_argument('--synthetic-dir', help="where to write the synthetic CSVs (default data/synthetic_x<N>)")
+    parser.add_argument('--db', help=f"database file (default {DB_FILE}, or ecommerce_data_x<N>.db with --scale)")
+    args = parser.parse_args()
+    db_path = args.db or (f"ecommerce_data_x{args.scale}.db" if args.scale else DB_FILE)
+    
+    if args.explain:
+        raise SystemExit(0 if explain_queries(db_path) else 1)
+    
+    if args.incremental is not None:
+        paths = args.incremental or [
+            p for p in (find_csv(AD_SALES_CSV), find_csv(TOTAL_SALES_CSV), find_csv(ELIGIBILITY_CSV)) if p
+        ]
+        success = ingest_incremental(paths, chunksize=args.chunksize, db_path=db_path)
+        print("\n🎉 Incremental ingest completed!" if success else "\n💥 Incremental ingest failed!")
+        raise SystemExit(0 if success else 1)
+    
+    csv_dirs = CSV_DIRS
+    if args.scale:
+        synthetic_dir = args.synthetic_dir or os.path.join('data', f'synthetic_x{args.scale}')
+        if not generate_scaled_csvs(synthetic_dir, args.scale, args.days_scale, args.seed):
+            raise SystemExit(1)
+        csv_dirs = [synthetic_dir]
+    
+    success = create_database(csv_dirs, db_path)
     if success:
         print("\n🎉 Database setup completed successfully!")
         print("Now you can run: python test_db.py")
@@ -5,6 +5,22 @@ import plotly.express as px
 import plotly.graph_objects as go
 import json
 
+
+def iter_sse_events(response):
+    """Yield (event, data) pairs from a text/event-stream response"""
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
 # Page config
 st.set_page_config(
     page_title="E-commerce AI Analytics Dashboard",
@@ -51,6 +67,7 @@ with col1:
     
     # Chart option
     include_chart = st.checkbox("📈 Include Chart", value=True)
+    stream_answer = st.checkbox("⚡ Stream Answer", value=True)
     
     # Process question
     question_to_process = None
@@ -76,7 +93,66 @@ with col2:
             st.error(f"Error loading schema: {e}")
 
 # Process and display results
-if question_to_process:
+if question_to_process and stream_answer:
+    st.header("🎯 Results")
+    
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        status_box = st.empty()
+        st.subheader("💡 Answer")
+        answer_box = st.empty()
+        sql_box = st.expander("🔍 View SQL Query")
+        data_box = st.expander("📋 View Raw Data")
+    with col2:
+        chart_box = st.container()
+    
+    status_box.info("🤖 Generating SQL query...")
+    try:
+        payload = {
+            "question": question_to_process,
+            "include_chart": include_chart
+        }
+        
+        with requests.post(f"{api_base_url}/ask/stream", json=payload, stream=True) as response:
+            if response.status_code != 200:
+                status_box.error(f"❌ Error: {response.status_code} - {response.text}")
+            else:
+                answer_text = ""
+                for event, data in iter_sse_events(response):
+                    if event == "sql":
+                        sql_box.code(data["sql_query"], language="sql")
+                        status_box.info("🗄️ Running query...")
+                    elif event == "rows":
+                        data_box.dataframe(pd.DataFrame(json.loads(data["result"])), use_container_width=True)
+                        if data.get("truncated"):
+                            data_box.caption(
+                                f"Showing the first rows of {data['row_count']}; "
+                                f"page through the rest at /results/{data['query_id']}"
+                            )
+                        status_box.info(f"✍️ {data['row_count']} rows returned, writing answer...")
+                    elif event == "token":
+                        answer_text += data["text"]
+                        answer_box.markdown(f"**{answer_text}**")
+                    elif event == "answer":
+                        answer_box.markdown(f"**{data['formatted_response']}**")
+                    elif event == "chart":
+                        with chart_box:
+                            if data.get("chart_data"):
+                                st.subheader("📊 Visualization")
+                                st.plotly_chart(json.loads(data["chart_data"]), use_container_width=True)
+                                if data.get("chart_type"):
+                                    st.caption(f"Chart Type: {data['chart_type'].title()}")
+                            else:
+                                st.info("No visualization generated for this query")
+                    elif event == "error":
+                        status_box.error(f"❌ Error: {data['detail']}")
+                        break
+                    elif event == "done":
+                        status_box.success("✅ Question processed successfully!")
+    except Exception as e:
+        status_box.error(f"❌ Connection error: {e}")
+
+elif question_to_process:
     st.header("🎯 Results")
     
     with st.spinner("🤖 AI is processing your question..."):
@@ -113,6 +189,11 @@ if question_to_process:
                                 data_dict = json.loads(result["result"])
                                 df = pd.DataFrame(data_dict)
                                 st.dataframe(df, use_container_width=True)
+                                if result.get("truncated"):
+                                    st.caption(
+                                        f"Showing {len(df)} of {result['row_count']} rows; "
+                                        f"page through the rest at /results/{result['query_id']}"
+                                    )
                             except:
                                 st.text(result["result"])
                 
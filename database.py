@@ -1,85 +1,477 @@
 import sqlite3
 import pandas as pd
 import os
+import logging
+import queue
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from cache import LRUCache, SingleFlight
+from sql_utils import canonicalize_sql
+from rollups import ROLLUP_PREFIX, RollupRouter
+from query_guard import QueryError, QueryGuard
+from log_utils import log_event, log_payload
+
+logger = logging.getLogger(__name__)
+
+
+# Fixed KPI queries served by the /demo/* endpoints
+DEMO_QUERIES = {
+    "total-sales": "SELECT SUM(total_sales) as total_sales FROM total_sales;",
+    "roas": """
+    SELECT 
+        SUM(ad_sales) as total_ad_sales,
+        SUM(ad_spend) as total_ad_spend,
+        ROUND(SUM(ad_sales) / SUM(ad_spend), 2) as roas
+    FROM ad_sales 
+    WHERE ad_spend > 0;
+    """,
+    "highest-cpc": """
+    SELECT 
+        item_id,
+        ROUND(SUM(ad_spend) / SUM(clicks), 2) as cpc
+    FROM ad_sales 
+    WHERE clicks > 0 
+    GROUP BY item_id
+    ORDER BY cpc DESC 
+    LIMIT 1;
+    """,
+}
+
+
+# Bookkeeping tables that are not part of the analytical schema shown to the LLM
+INTERNAL_TABLE_PREFIXES = ("sqlite_", ROLLUP_PREFIX, "ingest_")
+
+# Storage behind the dictionary-encoded views (create_database.DICTIONARY_COLUMNS);
+# the LLM queries the views, which keep the original column sets
+STORAGE_TABLES = frozenset({"eligibility_checks", "eligibility_messages"})
+
+
+class _PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that remembers which database file it was opened on"""
+    file_id = None
+    data_version = None
+
+
+class ConnectionPool:
+    """Bounded pool of read-only SQLite connections shared across requests"""
+
+    def __init__(self, db_path, max_size=8, timeout=30.0,
+                 cache_size_kib=64 * 1024, mmap_size=256 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        # Signalled whenever a connection is returned or a slot is freed
+        self._available = threading.Condition(self._lock)
+        self._open = 0
+        self._file_id = None
+        self._stats = {"checkouts": 0, "waits": 0, "opened": 0, "closed": 0}
+
+    def _current_file_id(self):
+        """Identity of the database file, changes when the file is rebuilt"""
+        try:
+            st = os.stat(self.db_path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _connect(self):
+        """Open a tuned read-only connection"""
+        uri = f"file:{os.path.abspath(self.db_path)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                               timeout=self.timeout, factory=_PooledConnection)
+        conn.file_id = self._file_id
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kib)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        finally:
+            with self._available:
+                self._open -= 1
+                self._stats["closed"] += 1
+                self._available.notify()
+
+    def _drain_if_stale(self):
+        """Drop idle connections that point at a replaced database file"""
+        file_id = self._current_file_id()
+        with self._lock:
+            if file_id == self._file_id:
+                return
+            self._file_id = file_id
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(conn)
+
+    def acquire(self):
+        """Check a connection out of the pool, opening one if below max_size"""
+        self._drain_if_stale()
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        with self._available:
+            self._stats["checkouts"] += 1
+            while True:
+                try:
+                    return self._idle.get_nowait()
+                except queue.Empty:
+                    pass
+                if self._open < self.max_size:
+                    self._open += 1
+                    self._stats["opened"] += 1
+                    break
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No database connection available after {self.timeout}s")
+                self._available.wait(remaining)
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._available:
+                self._open -= 1
+                self._available.notify()
+            raise
+
+    def release(self, conn):
+        """Return a connection to the pool"""
+        if conn.file_id != self._file_id:
+            self._close(conn)
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        with self._available:
+            self._idle.put(conn)
+            self._available.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """Close every idle connection (used on shutdown)"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(conn)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["open_connections"] = self._open
+        stats["idle_connections"] = self._idle.qsize()
+        stats["max_size"] = self.max_size
+        return stats
+
+
+def _frame_size(df):
+    """Approximate in-memory size of a DataFrame in bytes"""
+    return int(df.memory_usage(deep=True).sum())
+
 
 class DatabaseManager:
-    def __init__(self, db_path="ecommerce_data.db"):
+    def __init__(self, db_path="ecommerce_data.db", pool_size=8, executor_workers=None,
+                 result_cache_size=512, result_cache_max_bytes=64 * 1024 * 1024,
+                 route_rollups=True, query_timeout=10.0, max_rows=100_000,
+                 max_join_scan_rows=1_000_000):
         self.db_path = db_path
+        self.pool = ConnectionPool(db_path, max_size=pool_size)
+        # Canonical SQL + database generation -> DataFrame. Cached frames are
+        # shared between callers and must be treated as read-only.
+        self.result_cache = LRUCache(
+            max_size=result_cache_size,
+            max_weight=result_cache_max_bytes,
+            weigher=_frame_size
+        )
+        # Identical queries already running are awaited instead of re-executed
+        self.query_flight = SingleFlight()
+        self._generation = 0
+        self._generation_lock = threading.Lock()
+        # (version, schema_info) from the last metadata scan
+        self._schema_snapshot = None
+        # Aggregate queries over the fact tables are answered from rollup tables
+        # built by create_database.py when those exist
+        self.router = RollupRouter() if route_rollups else None
+        self._table_names_cache = None
+        # Read-only, plan, time and row limits for every executed query
+        self.guard = QueryGuard(
+            timeout=query_timeout,
+            max_rows=max_rows,
+            max_join_scan_rows=max_join_scan_rows
+        )
+        self._table_rows_cache = None
+        self._routing_stats = {"routed": 0, "raw": 0}
+        self._stats_lock = threading.Lock()
+        # Bounded worker pool so blocking SQLite calls never run on the event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=executor_workers or pool_size,
+            thread_name_prefix="sqlite"
+        )
+    
+    async def _run_in_executor(self, func, *args):
+        loop = asyncio.get_running_loop()
+        # run_in_executor does not carry contextvars (the request id) over
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, context.run, func, *args)
+    
+    async def execute_query_async(self, query, params=None):
+        """Run execute_query on the database executor"""
+        return await self._run_in_executor(self.execute_query, query, params)
+    
+    async def get_schema_info_async(self):
+        """Run get_schema_info on the database executor"""
+        return await self._run_in_executor(self.get_schema_info)
+    
+    async def get_schema_snapshot_async(self):
+        """Run get_schema_snapshot on the database executor"""
+        return await self._run_in_executor(self.get_schema_snapshot)
+    
+    async def validate_query_async(self, query, params=None):
+        """Run validate_query on the database executor"""
+        return await self._run_in_executor(self.validate_query, query, params)
+    
+    async def ping_async(self):
+        """Run ping on the database executor"""
+        return await self._run_in_executor(self.ping)
+        
+    def execute_query(self, query, params=None):
+        """Execute SQL query (with optional ``?`` parameters) and return results with clean logging
         
-    def execute_query(self, query):
-        """Execute SQL query and return results with clean logging"""
+        Concurrent calls for the same SQL, parameters and database generation
+        share a single execution. Failures are returned as a QueryError rather
+        than raised.
+        """
         
-        print(f"Connecting to SQLite database: {self.db_path}")
-        conn = sqlite3.connect(self.db_path)
+        params = tuple(params) if params else None
         
         try:
-            print("Executing SQL query...")
-            print(f"   Query: {query}")
+            self.guard.check_statement(query)
+            with self.pool.connection() as conn:
+                cache_key = (canonicalize_sql(query), params, self._observe_generation(conn))
             
-            # Show which table is being accessed
-            query_upper = query.upper()
-            if 'FROM' in query_upper:
-                table_part = query_upper.split('FROM')[1].split()[0]
-                print(f"Accessing table: {table_part}")
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                log_event(logger, logging.DEBUG, "Result cache hit", rows=len(cached))
+                return cached
             
-            result = pd.read_sql_query(query, conn)
+            return self.query_flight.run(
+                cache_key, lambda: self._execute_uncached(query, params, cache_key)
+            )
             
-            print("Query successful!")
-            print(f"Retrieved {len(result)} rows")
-            if not result.empty:
-                print(f"Column names: {list(result.columns)}")
-                print("First few results:")
-                for idx, row in result.head(3).iterrows():
-                    print(f"   Row {idx}: {dict(row)}")
+        except Exception as e:
+            error = QueryError.from_exception(e)
+            log_event(logger, logging.WARNING, "Database error", code=error.code, error=error.message)
+            return error
+    
+    def validate_query(self, query, params=None):
+        """Check that a query compiles and passes the guard without running it
+        
+        Returns None when the query is valid, otherwise the QueryError that
+        executing it would have produced.
+        """
+        params = tuple(params) if params else None
+        try:
+            with self.pool.connection() as conn:
+                generation = self._observe_generation(conn)
+                self.guard.validate(conn, query, params, self._table_rows(conn, generation))
+            return None
+        except Exception as e:
+            return QueryError.from_exception(e)
+    
+    def _execute_uncached(self, query, params, cache_key):
+        """Run a query against the database and store the result in the cache"""
+        with self.pool.connection() as conn:
+            log_payload(logger, "sql", "Executing SQL", lambda: query, params=params)
             
-            return result
+            routed = None
+            if self.router is not None:
+                routed = self.router.route(query, self._table_names(conn))
             
-        except Exception as e:
-            print(f"Database error: {str(e)}")
-            return f"Error executing query: {str(e)}"
-        finally:
-            conn.close()
-            print("Database connection closed")
+            table_rows = self._table_rows(conn, cache_key[2])
+            result = None
+            if routed:
+                log_event(logger, logging.DEBUG, "Answering from rollup table", rollup=routed[1])
+                try:
+                    result = self.guard.run(conn, routed[0], params, table_rows)
+                except QueryError:
+                    raise
+                except Exception as e:
+                    # e.g. rollups built by an older version lack a column
+                    log_event(logger, logging.WARNING, "Rollup query failed, using raw tables",
+                              rollup=routed[1], error=str(e))
+                    routed = None
+            if result is None:
+                result = self.guard.run(conn, query, params, table_rows)
+            with self._stats_lock:
+                self._routing_stats["routed" if routed else "raw"] += 1
+        
+        log_event(logger, logging.DEBUG, "Query successful", rows=len(result), columns=list(result.columns))
+        log_payload(logger, "rows", "First rows", lambda: result.head(3).to_string())
+        
+        self.result_cache.set(cache_key, result)
+        return result
     
     def get_schema_info(self):
         """Get database schema information"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        schema_info = {}
+        return self.get_schema_snapshot()[1]
+    
+    def get_schema_snapshot(self):
+        """Return (schema_version, schema_info), rescanning tables only when the schema changed
         
-        # Get table names
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
+        ``PRAGMA schema_version`` is a single header read, so checking it on every
+        call is much cheaper than listing sqlite_master and every table_info.
+        """
+        with self.pool.connection() as conn:
+            schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+            # A rebuilt file can restart at the same schema_version
+            version_key = (conn.file_id, schema_version)
+            snapshot = self._schema_snapshot
+            if snapshot is not None and snapshot[0] == version_key:
+                return schema_version, snapshot[1]
+            
+            schema_info = {}
+            cursor = conn.cursor()
+            
+            # Get table and view names (rollups, manifest, statistics and view storage are internal)
+            cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view');")
+            tables = cursor.fetchall()
+            
+            for table in tables:
+                table_name = table[0]
+                if table_name.startswith(INTERNAL_TABLE_PREFIXES) or table_name in STORAGE_TABLES:
+                    continue
+                cursor.execute(f"PRAGMA table_info({table_name});")
+                columns = cursor.fetchall()
+                schema_info[table_name] = [col[1] for col in columns]  # Column names
         
-        for table in tables:
-            table_name = table[0]
-            cursor.execute(f"PRAGMA table_info({table_name});")
-            columns = cursor.fetchall()
-            schema_info[table_name] = [col[1] for col in columns]  # Column names
+        self._schema_snapshot = (version_key, schema_info)
+        return schema_version, schema_info
+
+    def _table_rows(self, conn, generation):
+        """Row count per table for plan checks, re-read only when the data changes
         
-        conn.close()
-        return schema_info
+        Counts come from sqlite_stat1 (written by ANALYZE) where available.
+        """
+        cached = self._table_rows_cache
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        rows = {}
+        try:
+            for table, stat in conn.execute("SELECT tbl, stat FROM sqlite_stat1"):
+                count = int(stat.split()[0])
+                rows[table.lower()] = max(rows.get(table.lower(), 0), count)
+        except sqlite3.Error:
+            pass
+        for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall():
+            if table.lower() not in rows and not table.startswith("sqlite_"):
+                rows[table.lower()] = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        self._table_rows_cache = (generation, rows)
+        return rows
+
+    def _table_names(self, conn):
+        """Names of all tables and views, re-read only when the schema changes"""
+        key = (conn.file_id, conn.execute("PRAGMA schema_version").fetchone()[0])
+        cached = self._table_names_cache
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        names = frozenset(
+            row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")
+        )
+        self._table_names_cache = (key, names)
+        return names
+
+    def routing_stats(self):
+        """How many executed queries were answered from rollups vs raw tables"""
+        with self._stats_lock:
+            return dict(self._routing_stats)
 
     def test_connection(self):
         """Test database connection and show sample data"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            with self.pool.connection() as conn:
+                # Test each table
+                tables = ['ad_sales', 'total_sales', 'eligibility']
+                for table in tables:
+                    try:
+                        count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                        log_event(logger, logging.INFO, "Table available", table=table, rows=count)
+                        log_payload(
+                            logger, "rows", "Sample data",
+                            lambda: pd.read_sql_query(f"SELECT * FROM {table} LIMIT 5", conn).to_string(),
+                            table=table
+                        )
+                    except Exception as e:
+                        log_event(logger, logging.ERROR, "Error reading table", table=table, error=str(e))
             
-            # Test each table
-            tables = ['ad_sales', 'total_sales', 'eligibility']
-            for table in tables:
-                try:
-                    df = pd.read_sql_query(f"SELECT * FROM {table} LIMIT 5", conn)
-                    print(f"\n{table} table - Sample data:")
-                    print(df.head())
-                    count_df = pd.read_sql_query(f"SELECT COUNT(*) as count FROM {table}", conn)
-                    print(f"Total rows: {count_df['count'].iloc[0]}")
-                except Exception as e:
-                    print(f"Error reading {table}: {e}")
-            
-            conn.close()
             return True
         except Exception as e:
-            print(f"Database connection error: {e}")
+            logger.error("Database connection error: %s", e)
             return False
+
+    def ping(self):
+        """Cheap readiness check: True if a pooled connection can run a query"""
+        try:
+            with self.pool.connection() as conn:
+                conn.execute("SELECT 1").fetchone()
+            return True
+        except Exception:
+            return False
+
+    def _observe_generation(self, conn):
+        """Current database generation as seen through ``conn``
+
+        ``PRAGMA data_version`` changes on a connection whenever another
+        connection commits to the file; any change bumps the shared generation
+        counter. Combined with the file fingerprint this also covers rebuilds.
+        """
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        with self._generation_lock:
+            if conn.data_version is not None and conn.data_version != data_version:
+                self._generation += 1
+            conn.data_version = data_version
+            generation = self._generation
+        return (self.data_fingerprint(), generation)
+
+    def data_fingerprint(self):
+        """Identity of the database contents; changes whenever the file is rebuilt or written"""
+        fingerprint = [self.db_path]
+        for path in (self.db_path, self.db_path + "-wal"):
+            try:
+                st = os.stat(path)
+            except OSError:
+                fingerprint.append(None)
+                continue
+            fingerprint.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        return tuple(fingerprint)
+
+    def pool_stats(self):
+        """Connection pool counters (checkouts, waits, open connections)"""
+        return self.pool.stats()
+
+    def close(self):
+        """Close pooled connections and stop the executor"""
+        self._executor.shutdown(wait=False)
+        self.pool.close_all()
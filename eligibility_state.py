@@ -0,0 +1,114 @@
+# Current eligibility per item and its change points.
+#
+# eligibility holds one row per item per snapshot, so "which products are
+# ineligible now" needs the latest row of every item. Two derived tables
+# answer such questions directly:
+#
+#   eligibility_current  one row per item: its latest snapshot
+#   eligibility_changes  the snapshots where an item's status differs from
+#                        its previous snapshot (plus each item's first one)
+#
+# Both are refreshed per item from the earliest snapshot time an ingest
+# touched, so loading a new snapshot costs work proportional to the items in
+# it, not to the whole history.
+
+CURRENT_TABLE = "eligibility_current"
+CHANGES_TABLE = "eligibility_changes"
+
+# Snapshots are read from the storage table, messages through the view's lookup
+CHECKS_TABLE = "eligibility_checks"
+MESSAGES_TABLE = "eligibility_messages"
+
+STATE_DDL = [
+    f"""CREATE TABLE IF NOT EXISTS {CURRENT_TABLE} (
+        item_id INTEGER PRIMARY KEY,
+        eligibility_datetime_utc TEXT NOT NULL,
+        eligibility INTEGER,
+        message TEXT
+    )""",
+    f"""CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (
+        item_id INTEGER NOT NULL,
+        eligibility_datetime_utc TEXT NOT NULL,
+        eligibility INTEGER,
+        previous_eligibility INTEGER,
+        message TEXT,
+        PRIMARY KEY (item_id, eligibility_datetime_utc)
+    ) WITHOUT ROWID""",
+    f"CREATE INDEX IF NOT EXISTS idx_{CURRENT_TABLE}_eligibility ON {CURRENT_TABLE} (eligibility)",
+    f"CREATE INDEX IF NOT EXISTS idx_{CHANGES_TABLE}_datetime ON {CHANGES_TABLE} (eligibility_datetime_utc)",
+]
+
+# Items to refresh and the earliest snapshot time loaded for each
+_TOUCHED_DDL = "CREATE TEMP TABLE IF NOT EXISTS eligibility_touched (item_id INTEGER PRIMARY KEY, since TEXT NOT NULL)"
+
+
+def _message(alias):
+    return f"(SELECT message FROM {MESSAGES_TABLE} m WHERE m.message_id = {alias}.message_id)"
+
+
+def refresh_eligibility_state(conn, touched=None):
+    """Bring eligibility_current and eligibility_changes up to date
+
+    ``touched`` maps item_id to the earliest eligibility_datetime_utc that
+    was inserted or restated for it; None rebuilds both tables from the
+    whole history. Returns the number of items refreshed.
+    """
+    for statement in STATE_DDL:
+        conn.execute(statement)
+    conn.execute(_TOUCHED_DDL)
+    conn.execute("DELETE FROM eligibility_touched")
+    if touched is None:
+        conn.execute(f"DELETE FROM {CURRENT_TABLE}")
+        conn.execute(f"DELETE FROM {CHANGES_TABLE}")
+        conn.execute(
+            f"INSERT INTO eligibility_touched SELECT item_id, '' FROM {CHECKS_TABLE} "
+            "WHERE item_id IS NOT NULL GROUP BY item_id"
+        )
+    else:
+        conn.executemany("INSERT INTO eligibility_touched VALUES (?, ?)", list(touched.items()))
+
+    # Change points from `since` on are recomputed; the last change point
+    # before it is the status the first recomputed snapshot is compared with
+    conn.execute(f"""
+        DELETE FROM {CHANGES_TABLE}
+        WHERE eligibility_datetime_utc >= (
+            SELECT since FROM eligibility_touched t WHERE t.item_id = {CHANGES_TABLE}.item_id
+        )
+    """)
+    conn.execute(f"""
+        INSERT INTO {CHANGES_TABLE}
+        SELECT item_id, eligibility_datetime_utc, eligibility, previous_eligibility, message
+        FROM (
+            SELECT s.item_id, s.eligibility_datetime_utc, s.eligibility, {_message('s')} AS message,
+                   CASE WHEN s.previous_row THEN s.previous_eligibility ELSE (
+                       SELECT h.eligibility FROM {CHANGES_TABLE} h
+                       WHERE h.item_id = s.item_id AND h.eligibility_datetime_utc < s.since
+                       ORDER BY h.eligibility_datetime_utc DESC LIMIT 1
+                   ) END AS previous_eligibility,
+                   s.previous_row OR EXISTS (
+                       SELECT 1 FROM {CHANGES_TABLE} h
+                       WHERE h.item_id = s.item_id AND h.eligibility_datetime_utc < s.since
+                   ) AS has_previous
+            FROM (
+                SELECT c.item_id, c.eligibility_datetime_utc, c.eligibility, c.message_id, t.since,
+                       LAG(c.eligibility) OVER w AS previous_eligibility,
+                       ROW_NUMBER() OVER w > 1 AS previous_row
+                FROM {CHECKS_TABLE} c JOIN eligibility_touched t ON t.item_id = c.item_id
+                WHERE c.eligibility_datetime_utc >= t.since
+                WINDOW w AS (PARTITION BY c.item_id ORDER BY c.eligibility_datetime_utc)
+            ) s
+        )
+        WHERE NOT has_previous OR eligibility IS NOT previous_eligibility
+    """)
+    conn.execute(f"""
+        INSERT OR REPLACE INTO {CURRENT_TABLE}
+        SELECT c.item_id, c.eligibility_datetime_utc, c.eligibility, {_message('c')}
+        FROM eligibility_touched t
+        JOIN {CHECKS_TABLE} c ON c.item_id = t.item_id AND c.eligibility_datetime_utc = (
+            SELECT MAX(eligibility_datetime_utc) FROM {CHECKS_TABLE} WHERE item_id = t.item_id
+        )
+    """)
+    refreshed = conn.execute("SELECT COUNT(*) FROM eligibility_touched").fetchone()[0]
+    conn.execute("DELETE FROM eligibility_touched")
+    conn.commit()
+    return refreshed
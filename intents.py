@@ -0,0 +1,250 @@
+import re
+import pandas as pd
+
+# Deterministic answers for common KPI questions.
+#
+# A question is answered here only when every word in it is accounted for: a
+# metric phrase, optional item/date filters, an optional ranking phrase and
+# filler words. Anything else ("trend", "by day", "by product", "how many",
+# "eligible", ...) falls through to the LLM.
+
+METRICS = {
+    "roas": {
+        "pattern": r"\broas\b|return on ad spend|return on advertising spend",
+        "label": "Return on Ad Spend (RoAS)",
+        "table": "ad_sales",
+        "expression": "ROUND(SUM(ad_sales) / SUM(ad_spend), 2)",
+        "filter": "ad_spend > 0",
+        "column": "roas",
+        "format": lambda v: f"{v:,.2f}",
+    },
+    "cpc": {
+        "pattern": r"\bcpc\b|cost per click",
+        "label": "Cost Per Click (CPC)",
+        "table": "ad_sales",
+        "expression": "ROUND(SUM(ad_spend) / SUM(clicks), 2)",
+        "filter": "clicks > 0",
+        "column": "cpc",
+        "format": lambda v: f"${v:,.2f}",
+    },
+    "ctr": {
+        "pattern": r"\bctr\b|click[ -]?through[ -]?rate",
+        "label": "Click-Through Rate (CTR)",
+        "table": "ad_sales",
+        "expression": "ROUND(100.0 * SUM(clicks) / SUM(impressions), 2)",
+        "filter": "impressions > 0",
+        "column": "ctr_percent",
+        "format": lambda v: f"{v:,.2f}%",
+    },
+    "ad_spend": {
+        "pattern": r"\bad spend\b|\badvertising spend\b|\bad cost\b",
+        "label": "ad spend",
+        "table": "ad_sales",
+        "expression": "ROUND(SUM(ad_spend), 2)",
+        "filter": None,
+        "column": "ad_spend",
+        "format": lambda v: f"${v:,.2f}",
+    },
+    "ad_sales": {
+        "pattern": r"\bad sales\b|\badvertising sales\b|\bad revenue\b",
+        "label": "ad sales",
+        "table": "ad_sales",
+        "expression": "ROUND(SUM(ad_sales), 2)",
+        "filter": None,
+        "column": "ad_sales",
+        "format": lambda v: f"${v:,.2f}",
+    },
+    "units": {
+        "pattern": r"\bunits?(?: sold| ordered)?\b",
+        "label": "units ordered",
+        "table": "total_sales",
+        "expression": "SUM(total_units_ordered)",
+        "filter": None,
+        "column": "total_units_ordered",
+        "format": lambda v: f"{v:,.0f}",
+    },
+    "total_sales": {
+        "pattern": r"\bsales\b|\brevenue\b",
+        "label": "total sales",
+        "table": "total_sales",
+        "expression": "ROUND(SUM(total_sales), 2)",
+        "filter": None,
+        "column": "total_sales",
+        "format": lambda v: f"${v:,.2f}",
+    },
+}
+
+_DATE = r"(\d{4}-\d{2}-\d{2})"
+_DATE_FILTERS = [
+    (re.compile(rf"\b(?:between|from)\s+{_DATE}\s+(?:and|to|through|until)\s+{_DATE}"), "date BETWEEN ? AND ?", "between {} and {}"),
+    (re.compile(rf"\b(?:since|after|from)\s+{_DATE}"), "date >= ?", "since {}"),
+    (re.compile(rf"\b(?:until|up to)\s+{_DATE}"), "date <= ?", "up to {}"),
+    (re.compile(rf"\bbefore\s+{_DATE}"), "date < ?", "before {}"),
+    (re.compile(rf"\b(?:on|for|at)?\s*{_DATE}"), "date = ?", "on {}"),
+]
+_ITEM_FILTER = re.compile(r"\b(?:product|item)(?:\s*_?\s*id)?\s*(?:#|number|no\.?)?\s*(\d+)\b")
+_TOP_N = re.compile(r"\btop\s+(\d+)\b")
+_RANK_DESC = re.compile(r"\b(?:highest|maximum|max|best|most|largest|biggest|top)\b")
+_RANK_ASC = re.compile(r"\b(?:lowest|minimum|min|worst|least|smallest)\b")
+
+# Words that may appear around a recognized metric without changing its meaning.
+# Counting words ("how many", "number of") are deliberately absent: those
+# questions ask for a count, not the metric's total.
+_FILLER = {
+    "what", "whats", "s", "is", "are", "was", "were", "my", "our", "the", "a", "an", "of",
+    "for", "total", "overall", "calculate", "compute", "show", "me", "give", "tell", "get",
+    "find", "had", "has", "have", "did", "do", "does", "all", "in", "value", "current",
+    "much", "how", "please", "can", "you", "i", "we", "us", "list", "amount", "sum", "and",
+    "id", "ids", "sold", "ordered",
+}
+
+# Words that pick out products; only filler in a ranking ("which product has
+# the highest CPC", "top 5 items by sales"). Without one they ask for a
+# per-product breakdown or a selection, which the LLM handles.
+_RANKING_FILLER = {"which", "product", "products", "item", "items", "by", "with"}
+
+
+class IntentMatch:
+    """A question resolved to parameterized SQL plus a deterministic answer"""
+
+    def __init__(self, name, sql, params, answer_builder):
+        self.name = name
+        self.sql = sql
+        self.params = params
+        self._answer_builder = answer_builder
+
+    def display_sql(self):
+        """SQL with parameters inlined, for showing to users"""
+        sql = self.sql
+        for value in self.params:
+            literal = str(value) if isinstance(value, int) else f"'{value}'"
+            sql = sql.replace("?", literal, 1)
+        return sql
+
+    def answer(self, result):
+        return self._answer_builder(result)
+
+
+class IntentMatcher:
+    """Maps common metric questions to SQL templates without calling the LLM"""
+
+    def match(self, question):
+        text = f" {question.lower()} "
+
+        params, conditions, scope = [], [], []
+
+        # Dates are read before punctuation is stripped so ISO dates stay intact
+        for pattern, condition, description in _DATE_FILTERS:
+            m = pattern.search(text)
+            if m:
+                params.extend(m.groups())
+                conditions.append(condition)
+                scope.append(description.format(*m.groups()))
+                text = text[:m.start()] + " " + text[m.end():]
+                break
+        dates = list(params)
+
+        text = re.sub(r"[^\w\s.#]", " ", text)
+        item_id = None
+        m = _ITEM_FILTER.search(text)
+        if m:
+            item_id = int(m.group(1))
+            text = text[:m.start()] + " " + text[m.end():]
+
+        limit = None
+        m = _TOP_N.search(text)
+        if m:
+            limit = int(m.group(1))
+            text = text[:m.start()] + " " + text[m.end():]
+            if limit < 1 or limit > 100:
+                return None
+
+        order = None
+        if _RANK_DESC.search(text):
+            order = "DESC"
+            text = _RANK_DESC.sub(" ", text)
+        elif _RANK_ASC.search(text):
+            order = "ASC"
+            text = _RANK_ASC.sub(" ", text)
+        if limit is not None and order is None:
+            order = "DESC"
+
+        metric_name = None
+        for name, spec in METRICS.items():
+            text, found = re.subn(spec["pattern"], " ", text)
+            if found:
+                metric_name = name
+                break
+        if metric_name is None:
+            return None
+
+        filler = _FILLER | _RANKING_FILLER if order is not None else _FILLER
+        leftover = [w for w in text.replace(".", " ").split() if w not in filler]
+        if leftover:
+            return None
+        # A ranking needs items to rank; a single item filter contradicts it
+        if order is not None and item_id is not None:
+            return None
+
+        spec = METRICS[metric_name]
+        where = [spec["filter"]] if spec["filter"] else []
+        if item_id is not None:
+            where.append("item_id = ?")
+            scope.insert(0, f"for product {item_id}")
+        where += conditions
+        sql_params = ([item_id] if item_id is not None else []) + dates
+        where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+        scope_text = f" {' '.join(scope)}" if scope else ""
+
+        if order is None:
+            sql = f"SELECT {spec['expression']} AS {spec['column']} FROM {spec['table']}{where_sql};"
+            return IntentMatch(
+                metric_name, sql, sql_params,
+                lambda result: _describe_total(metric_name, spec, result, scope_text)
+            )
+
+        sql = (
+            f"SELECT item_id, {spec['expression']} AS {spec['column']} FROM {spec['table']}{where_sql} "
+            f"GROUP BY item_id ORDER BY {spec['column']} {order} LIMIT {limit or 1};"
+        )
+        return IntentMatch(
+            f"{metric_name}_ranking", sql, sql_params,
+            lambda result: _describe_ranking(spec, result, order, limit, scope_text)
+        )
+
+
+def _value(result, column):
+    if not isinstance(result, pd.DataFrame) or result.empty:
+        return None
+    value = result[column].iloc[0]
+    return None if pd.isna(value) else float(value)
+
+
+def _describe_total(metric_name, spec, result, scope_text):
+    value = _value(result, spec["column"])
+    if value is None:
+        return f"No data was found to calculate {spec['label']}{scope_text}."
+    formatted = spec["format"](value)
+    if metric_name == "total_sales":
+        return f"Your total sales{scope_text} is {formatted}"
+    if metric_name == "roas":
+        return (f"Your Return on Ad Spend (RoAS){scope_text} is {formatted}, meaning you generate "
+                f"${formatted} in sales for every $1 spent on advertising")
+    return f"Your {spec['label']}{scope_text} is {formatted}"
+
+
+def _describe_ranking(spec, result, order, limit, scope_text):
+    if not isinstance(result, pd.DataFrame) or result.empty:
+        return f"No products had data to rank by {spec['label']}{scope_text}."
+    direction = "highest" if order == "DESC" else "lowest"
+    if limit is None:
+        item_id = int(result["item_id"].iloc[0])
+        value = spec["format"](float(result[spec["column"]].iloc[0]))
+        return f"Product ID {item_id} had the {direction} {spec['label']}{scope_text} at {value}"
+    lines = [
+        f"{rank}. Product ID {int(row['item_id'])}: {spec['format'](float(row[spec['column']]))}"
+        for rank, (_, row) in enumerate(result.iterrows(), start=1)
+        if not pd.isna(row[spec["column"]])
+    ]
+    heading = "Top" if order == "DESC" else "Bottom"
+    return f"{heading} {len(lines)} products by {spec['label']}{scope_text}:\n" + "\n".join(lines)
@@ -1,61 +1,159 @@
-import requests
+import asyncio
+import httpx
 import json
+import logging
 import re
+import time
+from prompt_builder import PromptBuilder
+from log_utils import log_event, log_payload
+from metrics import record_tokens
+from config import (
+    OLLAMA_BASE_URL, OLLAMA_MODEL, OLLAMA_TIMEOUT, OLLAMA_KEEP_ALIVE,
+    OLLAMA_HEALTH_TIMEOUT, LLM_MAX_CONCURRENCY
+)
+
+logger = logging.getLogger(__name__)
 
 class MistralLLMService:
-    def __init__(self, base_url="http://localhost:11434"):
+    def __init__(self, base_url=OLLAMA_BASE_URL, model=OLLAMA_MODEL,
+                 timeout=OLLAMA_TIMEOUT, max_concurrency=LLM_MAX_CONCURRENCY,
+                 keep_alive=OLLAMA_KEEP_ALIVE, health_timeout=OLLAMA_HEALTH_TIMEOUT):
         self.base_url = base_url
-        self.model = "mistral:7b-instruct"
+        self.model = model
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.keep_alive = keep_alive
+        self.health_timeout = health_timeout
+        self._client = None
+        self._semaphore = None
+        # Warm-up state reported by /health
+        self.warmup = {"status": "pending", "seconds": None, "error": None}
+    
+    def _get_client(self):
+        """Shared async HTTP client, created lazily inside the running event loop"""
+        if self._client is None:
+            # Generations are capped by the semaphore; the extra connection
+            # keeps /health probes from waiting on a busy pool
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency + 1,
+                    max_keepalive_connections=self.max_concurrency + 1
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
     
-    def generate_sql_query(self, question, schema_info):
-        """Generate SQL query from natural language question"""
-        schema_text = self._format_schema(schema_info)
+    def _payload(self, prompt, stream):
+        return {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive
+        }
+    
+    async def warm_up(self):
+        """Load the model into Ollama's memory so the first question skips the load
         
-        prompt = f"""
-You are an expert SQL analyst. Given the database schema below, convert the natural language question into a precise SQL query.
-
-Database Schema:
-{schema_text}
-
-Important Table Information:
-- ad_sales: Contains advertising sales data with columns like date, item_id, ad_sales, impressions, ad_spend, clicks, units_sold
-- total_sales: Contains total sales data with columns like date, item_id, total_sales, total_units_ordered  
-- eligibility: Contains product eligibility data with columns like eligibility_datetime_utc, item_id, eligibility, message
-
-CRITICAL RULES FOR SPECIFIC QUERIES:
-1. For "highest CPC" or "maximum CPC": Use ORDER BY cpc DESC LIMIT 1
-2. For "lowest CPC" or "minimum CPC": Use ORDER BY cpc ASC LIMIT 1
-3. For "highest RoAS": Use ORDER BY roas DESC LIMIT 1
-4. For "lowest RoAS": Use ORDER BY roas ASC LIMIT 1
-
-IMPORTANT RULES:
-1. Return ONLY the SQL query, no explanations, no "SQL" prefix, no markdown
-2. Start directly with SELECT, INSERT, UPDATE, or DELETE
-3. Use proper SQLite syntax
-4. For RoAS calculations: SUM(ad_sales) / SUM(ad_spend) WHERE ad_spend > 0
-5. For CPC calculations: SUM(ad_spend) / SUM(clicks) WHERE clicks > 0
-6. For total sales: SUM(total_sales) FROM total_sales
-7. Use ROUND() with 2 decimal places for financial calculations
-8. End with a single semicolon
-9. Filter out zero denominators with WHERE clauses
-10. Do not generate multiple statements or fragments
-
-Special calculation rules:
-    - For RoAS (Return on Ad Spend): Use SUM(ad_sales) / SUM(ad_spend)
-    - Always filter WHERE ad_spend > 0 for RoAS calculations
-    - Use ROUND() function with 2 decimal places for financial calculations
-
-Question: {question}
-
-Query:"""
+        A generate request with an empty prompt only loads the model; it is
+        sent with the configured keep_alive so the model stays resident.
+        """
+        self.warmup = {"status": "running", "seconds": None, "error": None}
+        started = time.perf_counter()
+        try:
+            log_event(logger, logging.INFO, "Warming up model", model=self.model, keep_alive=self.keep_alive)
+            client = self._get_client()
+            async with self._semaphore:
+                response = await client.post("/api/generate", json=self._payload("", False))
+            response.raise_for_status()
+            elapsed = round(time.perf_counter() - started, 3)
+            self.warmup = {"status": "ready", "seconds": elapsed, "error": None}
+            log_event(logger, logging.INFO, "Model loaded", model=self.model, seconds=elapsed)
+        except Exception as e:
+            self.warmup = {"status": "failed", "seconds": None, "error": str(e)}
+            log_event(logger, logging.WARNING, "Model warm-up failed", model=self.model, error=str(e))
+        return self.warmup["status"] == "ready"
+    
+    async def health(self):
+        """Report whether Ollama is reachable, has the model and has it loaded"""
+        status = {
+            "model": self.model,
+            "llm_available": False,
+            "model_installed": False,
+            "model_loaded": False,
+            "warmup": self.warmup
+        }
+        client = self._get_client()
+        try:
+            tags = await client.get("/api/tags", timeout=self.health_timeout)
+            tags.raise_for_status()
+            installed = {m.get("name") for m in tags.json().get("models", [])}
+            status["model_installed"] = self._model_in(installed)
+            
+            loaded = await client.get("/api/ps", timeout=self.health_timeout)
+            if loaded.status_code == 200:
+                running = {m.get("name") for m in loaded.json().get("models", [])}
+                status["model_loaded"] = self._model_in(running)
+        except Exception as e:
+            status["error"] = str(e)
+        status["llm_available"] = status["model_installed"]
+        return status
+    
+    def _model_in(self, names):
+        # Ollama reports untagged models with an implicit ":latest"
+        model = self.model if ":" in self.model else f"{self.model}:latest"
+        return model in names or self.model in names
+    
+    async def aclose(self):
+        """Close the shared HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def generate_sql_query(self, question, schema_info, prompt_builder=None):
+        """Generate SQL query from natural language question
+        
+        ``prompt_builder`` is a PromptBuilder for ``schema_info``; pass a cached
+        one to avoid re-indexing the schema on every call.
+        """
+        if prompt_builder is None:
+            prompt_builder = PromptBuilder(schema_info)
+        
+        prompt, details = prompt_builder.build(question)
+        log_event(logger, logging.INFO, "SQL prompt built", stage="generate_sql", **details)
 
-        response = self._call_ollama(prompt)
+        response = await self._call_ollama(prompt)
         sql_query = self._extract_sql_from_response(response)
         return sql_query
     
-    def format_response(self, question, query_result, original_question):
+    async def repair_sql_query(self, question, failed_sql, error, schema_info, prompt_builder=None):
+        """Ask the model to correct ``failed_sql`` given the database's error message"""
+        if prompt_builder is None:
+            prompt_builder = PromptBuilder(schema_info)
+        
+        prompt, details = prompt_builder.build(question, failed_sql=failed_sql, error=error)
+        log_event(logger, logging.INFO, "SQL repair prompt built", stage="repair_sql",
+                  estimated_tokens=details["estimated_tokens"], error=error)
+        
+        response = await self._call_ollama(prompt)
+        return self._extract_sql_from_response(response)
+    
+    async def format_response(self, question, query_result, original_question):
         """Format the query result into a human-readable response"""
-        prompt = f"""
+        prompt = self._build_format_prompt(query_result, original_question)
+        response = await self._call_ollama(prompt)
+        return response.strip()
+    
+    async def stream_format_response(self, question, query_result, original_question):
+        """Yield the formatted answer token by token as Ollama generates it"""
+        prompt = self._build_format_prompt(query_result, original_question)
+        log_payload(logger, "prompt", "LLM prompt", lambda: prompt, stream=True)
+        async for token in self._stream_ollama(prompt):
+            yield token
+    
+    def _build_format_prompt(self, query_result, original_question):
+        return f"""
 You are a business analyst. Format the following query result into a clear, professional response.
 
 Original Question: {original_question}
@@ -64,51 +162,69 @@ Query Result: {query_result}
 Provide a concise, business-friendly answer that directly addresses the question. Include specific numbers and insights.
 
 Response:"""
-
-        response = self._call_ollama(prompt)
-        return response.strip()
     
-    def _call_ollama(self, prompt):
+    async def _call_ollama(self, prompt):
         """Make API call to Ollama with clean logging"""
         try:
-            print("Making API call to Ollama...")
-            print(f"URL: {self.base_url}/api/generate")
-            print(f"Model: {self.model}")
-            print(f"Prompt length: {len(prompt)} characters")
+            log_event(logger, logging.DEBUG, "Calling Ollama", model=self.model, prompt_chars=len(prompt))
+            log_payload(logger, "prompt", "LLM prompt", lambda: prompt)
             
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False
-            }
+            payload = self._payload(prompt, False)
             
-            print("Sending request to Mistral 7B...")
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json=payload,
-                timeout=60
-            )
+            client = self._get_client()
+            async with self._semaphore:
+                response = await client.post("/api/generate", json=payload)
             
             if response.status_code == 200:
-                llm_response = response.json()["response"]
-                print("LLM Response received!")
-                print(f"Response length: {len(llm_response)} characters")
-                print(f"LLM Output: {llm_response[:200]}..." if len(llm_response) > 200 else f"LLM Output: {llm_response}")
+                data = response.json()
+                llm_response = data["response"]
+                self._log_token_counts(data)
+                log_payload(logger, "llm_response", "LLM response", lambda: llm_response)
                 return llm_response
             else:
-                print(f"LLM API Error: {response.status_code} - {response.text}")
+                log_event(logger, logging.ERROR, "LLM API error",
+                          status_code=response.status_code, body=response.text[:500])
                 return f"Error: {response.status_code} - {response.text}"
                 
         except Exception as e:
-            print(f"LLM Service Error: {str(e)}")
+            log_event(logger, logging.ERROR, "LLM service error", error=str(e))
             return f"Error calling LLM: {str(e)}"
     
-    def _format_schema(self, schema_info):
-        """Format schema information for the prompt"""
-        schema_text = ""
-        for table, columns in schema_info.items():
-            schema_text += f"\nTable: {table}\nColumns: {', '.join(columns)}\n"
-        return schema_text
+    def _log_token_counts(self, data):
+        """Log and count Ollama's own prompt (prefill) and completion token counts"""
+        if "prompt_eval_count" not in data and "eval_count" not in data:
+            return
+        record_tokens(data.get("prompt_eval_count", 0), data.get("eval_count", 0))
+        log_event(
+            logger, logging.INFO, "LLM call completed",
+            prompt_tokens=data.get("prompt_eval_count", 0),
+            prefill_ms=round(data.get("prompt_eval_duration", 0) / 1e6),
+            completion_tokens=data.get("eval_count", 0)
+        )
+    
+    async def _stream_ollama(self, prompt):
+        """Stream incremental response tokens from Ollama; raises on HTTP errors"""
+        payload = self._payload(prompt, True)
+        
+        client = self._get_client()
+        async with self._semaphore:
+            async with client.stream("POST", "/api/generate", json=payload) as response:
+                if response.status_code != 200:
+                    body = (await response.aread()).decode("utf-8", "replace")
+                    raise RuntimeError(f"LLM API Error: {response.status_code} - {body}")
+                
+                # Ollama streams one JSON object per line
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise RuntimeError(f"LLM API Error: {chunk['error']}")
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        self._log_token_counts(chunk)
+                        break
     
     def _extract_sql_from_response(self, response):
         """Extract SQL query from LLM response"""
@@ -0,0 +1,89 @@
+import contextvars
+import json
+import logging
+import uuid
+from config import LOG_LEVEL, LOG_FORMAT, LOG_FILE, LOG_PAYLOADS
+
+# Structured logging shared by the API, database and LLM layers.
+#
+# Every record carries the id of the request being served, so the stages of
+# one question can be followed through interleaved concurrent requests.
+# Expensive payloads (prompts, SQL, result rows...) are passed as callables
+# and only rendered when DEBUG is enabled and their stage is listed in
+# LOG_PAYLOADS.
+
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+PAYLOAD_STAGES = ("schema", "prompt", "llm_response", "sql", "rows", "answer")
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:12]
+
+
+class _RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human readable lines with key=value fields appended"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload = fields.get("payload")
+            line += "".join(f" {key}={value}" for key, value in fields.items() if key != "payload")
+            if payload is not None:
+                line += f"\n{payload}"
+        return line
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, log_file=LOG_FILE):
+    """Install stream (and optional file) handlers on the root logger"""
+    formatter = JsonFormatter() if fmt == "json" else TextFormatter()
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        handler.addFilter(_RequestIdFilter())
+    logging.basicConfig(level=level, handlers=handlers, force=True)
+
+
+def log_event(logger, level, event, **fields):
+    """Log ``event`` with structured ``fields`` if ``level`` is enabled"""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields})
+
+
+def payload_enabled(logger, stage):
+    return stage in LOG_PAYLOADS and logger.isEnabledFor(logging.DEBUG)
+
+
+def log_payload(logger, stage, event, build, **fields):
+    """Log the payload returned by ``build()`` at DEBUG, only calling it when enabled"""
+    if payload_enabled(logger, stage):
+        logger.debug(event, extra={"fields": {"stage": stage, **fields, "payload": build()}})
@@ -1,46 +1,100 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from contextlib import asynccontextmanager
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
 import pandas as pd
-import io
-import base64
+import asyncio
+import hashlib
+import json
 import logging
-from datetime import datetime
-from database import DatabaseManager
+import time
+from database import DatabaseManager, DEMO_QUERIES
 from llm_service import MistralLLMService
-from typing import Optional
-
-# Configure clean logging without emojis to avoid Unicode errors
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('demo.log', encoding='utf-8')
-    ]
+from cache import AsyncSingleFlight, LRUCache, normalize_question
+from intents import IntentMatcher
+from prompt_builder import PromptBuilder
+from result_summary import summarize_result
+from charts import chart_cache, generate_chart
+from sql_utils import canonicalize_sql, limit_sql
+from log_utils import configure_logging, log_event, log_payload, new_request_id, request_id_var
+from metrics import (
+    current_timings, end_request, render_prometheus, request_seconds, server_timing, stage, start_request
 )
+from typing import Dict, List, Optional
+from config import (
+    DB_PATH, DB_POOL_SIZE, DB_EXECUTOR_WORKERS, ASK_MAX_CONCURRENCY,
+    SQL_CACHE_SIZE, SQL_CACHE_TTL, RESULT_CACHE_SIZE, RESULT_CACHE_MAX_BYTES,
+    ROLLUP_ROUTING, INTENT_FAST_PATH, BATCH_MAX_CONCURRENCY, BATCH_MAX_QUESTIONS,
+    OLLAMA_WARMUP, SQL_VALIDATION, SQL_REPAIR_ATTEMPTS, QUERY_TIMEOUT, QUERY_MAX_ROWS, QUERY_MAX_JOIN_SCAN_ROWS, RESULT_MAX_ROWS, RESULT_PAGE_MAX, RESULT_HANDLE_CACHE_SIZE,
+    RESULT_HANDLE_TTL
+)
+
+# Structured, request-correlated logging (LOG_LEVEL, LOG_FORMAT, LOG_FILE, LOG_PAYLOADS)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Initialize services globally
-db = DatabaseManager("ecommerce_data.db")
+db = DatabaseManager(
+    DB_PATH,
+    pool_size=DB_POOL_SIZE,
+    executor_workers=DB_EXECUTOR_WORKERS,
+    result_cache_size=RESULT_CACHE_SIZE,
+    result_cache_max_bytes=RESULT_CACHE_MAX_BYTES,
+    route_rollups=ROLLUP_ROUTING,
+    query_timeout=QUERY_TIMEOUT,
+    max_rows=QUERY_MAX_ROWS,
+    max_join_scan_rows=QUERY_MAX_JOIN_SCAN_ROWS
+)
 llm = MistralLLMService()
+# Known metric questions are answered from SQL templates without the LLM
+intent_matcher = IntentMatcher() if INTENT_FAST_PATH else None
+# Normalized question + database fingerprint -> generated SQL
+sql_cache = LRUCache(max_size=SQL_CACHE_SIZE, ttl=SQL_CACHE_TTL)
+# query_id -> (sql, params) of results too large to return in one response
+result_handles = LRUCache(max_size=RESULT_HANDLE_CACHE_SIZE, ttl=RESULT_HANDLE_TTL)
+# Outcomes of validating generated SQL and asking the LLM to repair it
+repair_stats = {
+    "validated": 0, "valid_first_try": 0, "repair_attempts": 0, "repaired": 0, "unrepaired": 0
+}
+# Concurrent /ask calls for the same normalized question share one pipeline run
+question_flight = AsyncSingleFlight()
+# Schema dictionary and the prompt builder indexing it, rebuilt only when the
+# database reports a new schema_version
+schema_cache = {"version": None, "schema": None, "prompt_builder": None}
+# Limits how many /ask pipelines are in flight; extra requests wait their turn
+ask_semaphore = None
+warmup_task = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    global ask_semaphore, warmup_task
+    
     # Startup code
-    print("Starting E-commerce AI Data Agent...")
+    logger.info("Starting E-commerce AI Data Agent")
+    ask_semaphore = asyncio.Semaphore(ASK_MAX_CONCURRENCY)
     
     # Test database connection
     if db.test_connection():
-        print("Database connection successful!")
+        logger.info("Database connection successful")
     else:
-        print("Database connection failed!")
+        logger.error("Database connection failed")
+    
+    try:
+        await _current_schema()
+        log_event(logger, logging.INFO, "Schema cached", schema_version=schema_cache["version"])
+    except Exception as e:
+        logger.error("Schema could not be loaded: %s", e)
+    
+    # Loading the model can take a while; serve requests meanwhile
+    if OLLAMA_WARMUP:
+        warmup_task = asyncio.create_task(llm.warm_up())
     
     yield
-    print("Application shutting down...")
+    logger.info("Application shutting down")
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    await llm.aclose()
+    db.close()
 
 app = FastAPI(
     title="E-commerce AI Data Agent", 
@@ -48,6 +102,31 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """Tag every log record of a request with its id and time its stages
+    
+    The id is the client's X-Request-ID if it sent one. Stage timings are
+    returned in a Server-Timing header; for /ask/stream the header is sent
+    before the pipeline runs and only carries the time to the first byte.
+    """
+    request_id = request.headers.get("X-Request-ID") or new_request_id()
+    token = request_id_var.set(request_id)
+    timings_token = start_request()
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+        elapsed = time.perf_counter() - started
+        timings = dict(current_timings())
+    finally:
+        end_request(timings_token)
+        request_id_var.reset(token)
+    endpoint = request.scope.get("endpoint")
+    request_seconds.observe(endpoint.__name__ if endpoint else "unmatched", elapsed)
+    response.headers["X-Request-ID"] = request_id
+    response.headers["Server-Timing"] = server_timing(timings, elapsed)
+    return response
+
 class QueryRequest(BaseModel):
     question: str
     include_chart: bool = False
@@ -59,6 +138,32 @@ class QueryResponse(BaseModel):
     formatted_response: str
     chart_data: Optional[str] = None
     chart_type: Optional[str] = None
+    # Rows in the full result; ``result`` holds at most RESULT_MAX_ROWS of them
+    row_count: Optional[int] = None
+    truncated: bool = False
+    # Pass to /results/{query_id} to page through a truncated result
+    query_id: Optional[str] = None
+    # Milliseconds spent per pipeline stage (schema, generate_sql, validate_sql,
+    # execute, format, chart); also sent as the Server-Timing header
+    timings: Optional[Dict[str, float]] = None
+
+class BatchQueryRequest(BaseModel):
+    questions: List[QueryRequest]
+
+class BatchItemResult(BaseModel):
+    index: int
+    question: str
+    response: Optional[QueryResponse] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+    # Set for query failures; see QueryError
+    error_code: Optional[str] = None
+    retryable: Optional[bool] = None
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchItemResult]
+    unique_questions: int
+    failed: int
 
 @app.get("/")
 async def root():
@@ -66,8 +171,13 @@ async def root():
         "message": "E-commerce AI Data Agent",
         "endpoints": {
             "/ask": "POST - Ask natural language questions",
+            "/ask/stream": "POST - Ask a question and stream progress as server-sent events",
+            "/ask/batch": "POST - Ask several questions concurrently",
             "/schema": "GET - View database schema",
             "/health": "GET - Health check",
+            "/stats": "GET - Connection pool and cache statistics",
+            "/metrics": "GET - Latency quantiles, token counts and cache ratios (Prometheus)",
+            "/results/{query_id}": "GET - Page through a truncated result",
             "/demo/total-sales": "GET - Demo total sales",
             "/demo/roas": "GET - Demo RoAS calculation",
             "/demo/highest-cpc": "GET - Demo highest CPC",
@@ -77,81 +187,294 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "llm_available": True}
+    """Liveness plus real readiness of the database and the Ollama model"""
+    llm_status = await llm.health()
+    database_available = await db.ping_async()
+    healthy = database_available and llm_status["llm_available"]
+    return {
+        "status": "healthy" if healthy else "degraded",
+        "database_available": database_available,
+        **llm_status
+    }
+
+@app.get("/stats")
+async def get_stats():
+    """Runtime statistics for the connection pool and caches"""
+    return {
+        "db_pool": db.pool_stats(),
+        "sql_cache": sql_cache.stats(),
+        "result_cache": db.result_cache.stats(),
+        "chart_cache": chart_cache.stats(),
+        "rollup_routing": db.routing_stats(),
+        "sql_repair": _repair_stats(),
+        "coalescing": {
+            "questions": question_flight.stats(),
+            "queries": db.query_flight.stats()
+        }
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: stage and request latency, LLM tokens, cache ratios"""
+    coalescing = {"questions": question_flight.stats(), "queries": db.query_flight.stats()}
+    body = render_prometheus(
+        caches={
+            "sql": sql_cache.stats(),
+            "result": db.result_cache.stats(),
+            "chart": chart_cache.stats()
+        },
+        counters={
+            "agent_sql_repair_total": ("Generated SQL validation and repair outcomes", "outcome", repair_stats),
+            "agent_rollup_routing_total": ("Executed queries by source", "source", db.routing_stats()),
+            "agent_coalesced_total": (
+                "Requests that shared an identical in-flight computation", "scope",
+                {scope: stats["coalesced"] for scope, stats in coalescing.items()}
+            )
+        }
+    )
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+def _repair_stats():
+    stats = dict(repair_stats)
+    invalid = stats["repaired"] + stats["unrepaired"]
+    stats["repair_success_ratio"] = round(stats["repaired"] / invalid, 4) if invalid else None
+    return stats
+
+async def _current_schema():
+    """Cached schema state, refreshed when PRAGMA schema_version changes"""
+    version, schema_info = await db.get_schema_snapshot_async()
+    if schema_cache["schema"] is not schema_info:
+        schema_cache.update(
+            version=version,
+            schema=schema_info,
+            prompt_builder=PromptBuilder(schema_info)
+        )
+    return schema_cache
 
 @app.get("/schema")
 async def get_schema():
     """Get database schema information"""
-    schema = db.get_schema_info()
-    return {"schema": schema}
+    schema_state = await _current_schema()
+    return {"schema": schema_state["schema"], "schema_version": schema_state["version"]}
+
+async def _generate_sql(question):
+    """Return (sql_query, cache_key, from_cache), consulting the SQL cache before the LLM"""
+    # Repeat questions against unchanged data reuse the SQL generated earlier
+    cache_key = (normalize_question(question), db.data_fingerprint())
+    sql_query = sql_cache.get(cache_key)
+    sql_from_cache = sql_query is not None
+    
+    if sql_from_cache:
+        log_event(logger, logging.INFO, "SQL cache hit", stage="generate_sql")
+    else:
+        # Step 1: Get database schema
+        with stage("schema"):
+            schema_state = await _current_schema()
+        schema_info = schema_state["schema"]
+        log_payload(logger, "schema", "Schema loaded", lambda: schema_info,
+                    schema_version=schema_state["version"])
+        
+        # Step 2: Generate SQL query using LLM
+        log_event(logger, logging.INFO, "Generating SQL", stage="generate_sql", model=llm.model)
+        with stage("generate_sql"):
+            sql_query = await llm.generate_sql_query(
+                question, schema_info, prompt_builder=schema_state["prompt_builder"]
+            )
+        if SQL_VALIDATION:
+            with stage("validate_sql"):
+                sql_query = await _validate_and_repair(question, sql_query, schema_state)
+    
+    return sql_query, cache_key, sql_from_cache
+
+async def _validate_and_repair(question, sql_query, schema_state):
+    """Compile generated SQL without running it and let the LLM fix what fails
+    
+    At most SQL_REPAIR_ATTEMPTS repair rounds are made; the last query is
+    returned either way, so an unrepairable query fails at execution with its
+    structured error. Retryable errors (busy, timeout) are not repaired.
+    """
+    repair_stats["validated"] += 1
+    error = await db.validate_query_async(sql_query)
+    if error is None:
+        repair_stats["valid_first_try"] += 1
+        return sql_query
+    
+    for attempt in range(1, SQL_REPAIR_ATTEMPTS + 1):
+        if error.retryable:
+            # busy/timeout come from database load, not from the SQL; rewriting
+            # the query would not help, so it runs and fails or succeeds as is
+            log_event(logger, logging.INFO, "SQL validation hit a transient error, not repairing",
+                      stage="validate_sql", code=error.code, error=error.message)
+            return sql_query
+        log_event(logger, logging.WARNING, "Generated SQL is invalid, requesting repair",
+                  stage="validate_sql", code=error.code, error=error.message,
+                  attempt=attempt, max_attempts=SQL_REPAIR_ATTEMPTS)
+        repair_stats["repair_attempts"] += 1
+        sql_query = await llm.repair_sql_query(
+            question, sql_query, error.message, schema_state["schema"],
+            prompt_builder=schema_state["prompt_builder"]
+        )
+        error = await db.validate_query_async(sql_query)
+        if error is None:
+            log_event(logger, logging.INFO, "SQL repaired", stage="validate_sql", attempt=attempt)
+            log_payload(logger, "sql", "Repaired SQL", lambda: sql_query)
+            repair_stats["repaired"] += 1
+            return sql_query
+    
+    repair_stats["unrepaired"] += 1
+    log_event(logger, logging.WARNING, "SQL still invalid after repair attempts",
+              stage="validate_sql", code=error.code, error=error.message, attempts=SQL_REPAIR_ATTEMPTS)
+    return sql_query
+
+async def _plan_query(question):
+    """Return (intent, sql_query, sql_params, cache_key, from_cache) for a question
+    
+    Questions recognised by the intent matcher get template SQL and need no LLM
+    call; for those ``cache_key`` is None.
+    """
+    intent = intent_matcher.match(question) if intent_matcher else None
+    if intent is not None:
+        log_event(logger, logging.INFO, "Matched intent, skipping the LLM", intent=intent.name)
+        return intent, intent.sql, intent.params, None, False
+    sql_query, cache_key, sql_from_cache = await _generate_sql(question)
+    return None, sql_query, None, cache_key, sql_from_cache
+
+def _query_error(error):
+    """HTTPException for a QueryError returned by the database layer
+    
+    The detail carries the error code and whether retrying may help, so
+    clients can back off on timeouts instead of resending rejected SQL.
+    """
+    headers = {"Retry-After": "1"} if error.retryable else None
+    return HTTPException(
+        status_code=error.status_code,
+        detail={"error": f"Query error: {error}", **error.to_dict()},
+        headers=headers
+    )
+
+def _query_id(sql_query, sql_params):
+    key = json.dumps([canonicalize_sql(sql_query), list(sql_params or [])], default=str)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+async def _fetch_result(sql_query, sql_params):
+    """Run a query capped at RESULT_MAX_ROWS rows; returns (result, row_count, query_id)
+    
+    ``query_id`` is only set when rows were left out; the full result can then
+    be paged through /results/{query_id}. On failure ``result`` is the error
+    string from the database layer.
+    """
+    with stage("execute"):
+        result = await db.execute_query_async(limit_sql(sql_query, RESULT_MAX_ROWS + 1), sql_params)
+    if not isinstance(result, pd.DataFrame) or len(result) <= RESULT_MAX_ROWS:
+        return result, len(result) if isinstance(result, pd.DataFrame) else None, None
+    
+    result = result.head(RESULT_MAX_ROWS)
+    with stage("execute"):
+        count = await db.execute_query_async(
+            f"SELECT COUNT(*) AS row_count FROM ({canonicalize_sql(sql_query)});", sql_params
+        )
+    row_count = int(count.iloc[0, 0]) if isinstance(count, pd.DataFrame) else None
+    query_id = _query_id(sql_query, sql_params)
+    result_handles.set(query_id, (sql_query, sql_params))
+    return result, row_count, query_id
+
+@app.get("/results/{query_id}")
+async def get_result_page(
+    query_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(RESULT_PAGE_MAX, ge=1, le=RESULT_PAGE_MAX)
+):
+    """One page of a result that was truncated in an /ask response"""
+    handle = result_handles.get(query_id)
+    if handle is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired query_id")
+    sql_query, sql_params = handle
+    
+    page = await db.execute_query_async(limit_sql(sql_query, limit + 1, offset), sql_params)
+    if not isinstance(page, pd.DataFrame):
+        raise _query_error(page)
+    has_more = len(page) > limit
+    page = page.head(limit).reset_index(drop=True)
+    page.index += offset
+    return {
+        "query_id": query_id,
+        "offset": offset,
+        "limit": limit,
+        "row_count": len(page),
+        "has_more": has_more,
+        "columns": list(page.columns),
+        "result": page.to_json()
+    }
 
 @app.post("/ask", response_model=QueryResponse)
 async def ask_question(request: QueryRequest):
     """Process natural language question and return answer with detailed logging"""
+    return await _answer_question(request)
+
+async def _answer_question(request: QueryRequest):
+    """Run the pipeline once for all concurrent requests asking the same question"""
+    async def compute():
+        async with ask_semaphore:
+            return await _process_question(request)
+    
+    key = (normalize_question(request.question), request.include_chart)
+    response = await question_flight.run(key, compute)
+    timings = current_timings()
+    if timings is not None and not timings and response.timings:
+        # Coalesced onto another request's run: report the stages it waited on
+        timings.update(response.timings)
+    if response.question != request.question:
+        response = response.model_copy(update={"question": request.question})
+    return response
+
+async def _process_question(request: QueryRequest):
+    """Run the question -> SQL -> result -> answer pipeline"""
     
     # Step 1: Log incoming request
-    print("=" * 60)
-    print("NEW API REQUEST RECEIVED")
-    print(f"Question: '{request.question}'")
-    print(f"Include Chart: {request.include_chart}")
-    print(f"Timestamp: {datetime.now()}")
-    print("=" * 60)
+    log_event(logger, logging.INFO, "Question received",
+              question=request.question, include_chart=request.include_chart)
     
     try:
-        # Step 2: Get database schema
-        print("STEP 1: Retrieving database schema...")
-        schema_info = db.get_schema_info()
-        print("Schema loaded successfully")
-        for table, columns in schema_info.items():
-            print(f"   Table '{table}': {columns}")
-        
-        # Step 3: Generate SQL query using LLM
-        print("\nSTEP 2: Calling Mistral 7B to generate SQL query...")
-        print(f"Sending question to LLM: '{request.question}'")
-        
-        sql_query = llm.generate_sql_query(request.question, schema_info)
-        
-        print("SQL Query Generated:")
-        print(f"Query: {sql_query}")
-        
-        # Step 4: Execute query
-        print("\nSTEP 3: Executing SQL query against database...")
-        print(f"Connecting to database: ecommerce_data.db")
-        print(f"Executing: {sql_query}")
+        intent, sql_query, sql_params, cache_key, sql_from_cache = await _plan_query(request.question)
+        log_payload(logger, "sql", "SQL planned", lambda: sql_query, cached=sql_from_cache)
         
-        query_result = db.execute_query(sql_query)
+        # Step 3: Execute query
+        query_result, row_count, query_id = await _fetch_result(sql_query, sql_params)
         
         if isinstance(query_result, pd.DataFrame):
-            print(f"Query executed successfully!")
-            print(f"Rows returned: {len(query_result)}")
-            print(f"Columns: {list(query_result.columns)}")
-            print(f"Sample data:")
-            print(f"{query_result.head().to_string()}")
+            if cache_key is not None and not sql_from_cache:
+                sql_cache.set(cache_key, sql_query)
+            log_event(logger, logging.INFO, "Query executed", stage="execute",
+                      rows=len(query_result), row_count=row_count, query_id=query_id)
+            log_payload(logger, "rows", "Sample rows", lambda: query_result.head().to_string())
             
-            # Step 5: Format response using LLM
-            print("\nSTEP 4: Formatting response using LLM...")
-            formatted_response = llm.format_response(
-                request.question, 
-                query_result.to_string(), 
-                request.question
-            )
-            print("Response formatted successfully")
-            print(f"Final Answer: {formatted_response}")
+            # Step 4: Format response using LLM
+            if intent is not None:
+                formatted_response = intent.answer(query_result)
+                sql_query = intent.display_sql()
+            else:
+                log_event(logger, logging.INFO, "Formatting answer", stage="format")
+                with stage("format"):
+                    formatted_response = await llm.format_response(
+                        request.question, 
+                        summarize_result(query_result, row_count), 
+                        request.question
+                    )
+            log_payload(logger, "answer", "Answer formatted", lambda: formatted_response)
             
-            # Step 6: Generate chart if requested
+            # Step 5: Generate chart if requested
             chart_data = None
             chart_type = None
             if request.include_chart and not query_result.empty:
-                print("\nSTEP 5: Generating chart visualization...")
-                chart_data, chart_type = generate_chart(query_result, request.question)
-                if chart_data:
-                    print(f"Chart generated successfully! Type: {chart_type}")
-                else:
-                    print("No chart generated (insufficient data)")
+                with stage("chart"):
+                    chart_data, chart_type = await asyncio.to_thread(
+                        generate_chart, query_result, request.question
+                    )
+                log_event(logger, logging.INFO, "Chart generated" if chart_data else "No chart generated",
+                          stage="chart", chart_type=chart_type)
             
             # Final response
-            print("\nREQUEST COMPLETED SUCCESSFULLY!")
-            print("=" * 60)
+            log_event(logger, logging.INFO, "Request completed", intent=intent.name if intent else None)
             
             return QueryResponse(
                 question=request.question,
@@ -159,110 +482,156 @@ async def ask_question(request: QueryRequest):
                 result=query_result.to_json(),
                 formatted_response=formatted_response,
                 chart_data=chart_data,
-                chart_type=chart_type
+                chart_type=chart_type,
+                row_count=row_count,
+                truncated=query_id is not None,
+                query_id=query_id,
+                timings=dict(current_timings() or {}) or None
             )
         else:
-            print(f"Database query failed: {query_result}")
-            raise HTTPException(status_code=400, detail=f"Query error: {query_result}")
+            log_event(logger, logging.WARNING, "Query failed", stage="execute",
+                      code=query_result.code, error=query_result.message)
+            raise _query_error(query_result)
             
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"ERROR OCCURRED: {str(e)}")
-        print("=" * 60)
+        logger.exception("Error processing question: %s", e)
         raise HTTPException(status_code=500, detail=f"Error processing question: {str(e)}")
 
-def generate_chart(data, question):
-    """Generate appropriate chart based on query results"""
-    try:
-        if data.empty:
-            return None, None
-        
-        question_lower = question.lower()
-        
-        # Determine chart type based on question and data
-        if len(data.columns) >= 2:
-            
-            # Time series data (line chart)
-            if 'date' in data.columns or any('time' in col.lower() for col in data.columns):
-                date_col = 'date' if 'date' in data.columns else [col for col in data.columns if 'time' in col.lower()][0]
-                value_col = [col for col in data.columns if col != date_col][0]
-                
-                fig = px.line(
-                    data, 
-                    x=date_col, 
-                    y=value_col,
-                    title=f"Trend Analysis: {question}",
-                    markers=True
-                )
-                return fig.to_json(), "line"
+@app.post("/ask/batch", response_model=BatchQueryResponse)
+async def ask_batch(batch: BatchQueryRequest):
+    """Answer a list of questions concurrently
+    
+    Identical questions (after normalization) are answered once. At most
+    BATCH_MAX_CONCURRENCY questions run at a time, and a failing question is
+    reported in its own result instead of aborting the batch.
+    """
+    if len(batch.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: {len(batch.questions)} questions (max {BATCH_MAX_QUESTIONS})"
+        )
+    
+    unique = {}
+    for request in batch.questions:
+        key = (normalize_question(request.question), request.include_chart)
+        unique.setdefault(key, request)
+    
+    batch_semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+    
+    batch_id = request_id_var.get()
+    
+    async def run(index, request):
+        # Each question gets its own id, derived from the batch's, and its own timings
+        request_id_var.set(f"{batch_id}.{index}")
+        start_request()
+        async with batch_semaphore:
+            try:
+                return await _answer_question(request), None, None
+            except HTTPException as e:
+                return None, e.detail, e.status_code
+            except Exception as e:
+                return None, str(e), 500
+    
+    keys = list(unique)
+    outcomes = await asyncio.gather(*(run(index, unique[key]) for index, key in enumerate(keys)))
+    outcome_by_key = dict(zip(keys, outcomes))
+    
+    results = []
+    for index, request in enumerate(batch.questions):
+        response, error, status_code = outcome_by_key[
+            (normalize_question(request.question), request.include_chart)
+        ]
+        if response is not None and response.question != request.question:
+            response = response.model_copy(update={"question": request.question})
+        detail = error if isinstance(error, dict) else {}
+        results.append(BatchItemResult(
+            index=index,
+            question=request.question,
+            response=response,
+            error=detail.get("error", error),
+            status_code=status_code,
+            error_code=detail.get("code"),
+            retryable=detail.get("retryable")
+        ))
+    
+    return BatchQueryResponse(
+        results=results,
+        unique_questions=len(keys),
+        failed=sum(1 for r in results if r.error is not None)
+    )
+
+def _sse(event, data):
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/ask/stream")
+async def ask_question_stream(request: QueryRequest):
+    """Answer a question as server-sent events
+    
+    Events, in order: ``sql`` (generated query), ``rows`` (query result),
+    ``token`` (incremental answer text), ``answer`` (full answer), ``chart``
+    (when requested) and ``done``. Failures end the stream with ``error``.
+    """
+    return StreamingResponse(
+        _stream_question(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _stream_question(request: QueryRequest):
+    async with ask_semaphore:
+        try:
+            yield _sse("status", {"stage": "generating_sql"})
+            intent, sql_query, sql_params, cache_key, sql_from_cache = await _plan_query(request.question)
+            yield _sse("sql", {
+                "sql_query": intent.display_sql() if intent else sql_query,
+                "cached": sql_from_cache,
+                "intent": intent.name if intent else None
+            })
             
-            # Sales by product (bar chart)
-            elif 'item_id' in data.columns and any('sales' in col.lower() for col in data.columns):
-                item_col = 'item_id'
-                value_col = [col for col in data.columns if 'sales' in col.lower()][0]
-                
-                # Limit to top 10 for readability
-                top_data = data.nlargest(10, value_col)
-                
-                fig = px.bar(
-                    top_data, 
-                    x=item_col, 
-                    y=value_col,
-                    title=f"Top Products: {question}",
-                    text=value_col
-                )
-                fig.update_traces(texttemplate='%{text:.2s}', textposition='outside')
-                return fig.to_json(), "bar"
+            query_result, row_count, query_id = await _fetch_result(sql_query, sql_params)
+            if not isinstance(query_result, pd.DataFrame):
+                yield _sse("error", {
+                    "stage": "query",
+                    "detail": f"Query error: {query_result}",
+                    **query_result.to_dict()
+                })
+                return
+            if cache_key is not None and not sql_from_cache:
+                sql_cache.set(cache_key, sql_query)
+            yield _sse("rows", {
+                "row_count": row_count,
+                "truncated": query_id is not None,
+                "query_id": query_id,
+                "columns": list(query_result.columns),
+                "result": query_result.to_json()
+            })
             
-            # Pie chart for categorical data with percentages
-            elif len(data) <= 10 and 'eligibility' in question_lower:
-                # For eligibility data
-                if 'eligibility' in data.columns:
-                    fig = px.pie(
-                        data, 
-                        names='eligibility', 
-                        values=data.columns[1] if len(data.columns) > 1 else 'count',
-                        title=f"Distribution: {question}"
-                    )
-                    return fig.to_json(), "pie"
+            if intent is not None:
+                formatted_response = intent.answer(query_result)
+                yield _sse("token", {"text": formatted_response})
+            else:
+                answer_parts = []
+                async for token in llm.stream_format_response(
+                    request.question, summarize_result(query_result, row_count), request.question
+                ):
+                    answer_parts.append(token)
+                    yield _sse("token", {"text": token})
+                formatted_response = "".join(answer_parts).strip()
+            yield _sse("answer", {"formatted_response": formatted_response})
             
-            # Scatter plot for correlation analysis
-            elif 'spend' in question_lower and 'sales' in question_lower:
-                x_col = [col for col in data.columns if 'spend' in col.lower()][0]
-                y_col = [col for col in data.columns if 'sales' in col.lower()][0]
-                
-                fig = px.scatter(
-                    data, 
-                    x=x_col, 
-                    y=y_col,
-                    title=f"Correlation Analysis: {question}",
-                    trendline="ols"
+            if request.include_chart and not query_result.empty:
+                chart_data, chart_type = await asyncio.to_thread(
+                    generate_chart, query_result, request.question
                 )
-                return fig.to_json(), "scatter"
+                yield _sse("chart", {"chart_data": chart_data, "chart_type": chart_type})
             
-            # Default bar chart
-            else:
-                fig = px.bar(
-                    data, 
-                    x=data.columns[0], 
-                    y=data.columns[1],
-                    title=f"Analysis: {question}"
-                )
-                return fig.to_json(), "bar"
-        
-        # Single column data (histogram)
-        elif len(data.columns) == 1:
-            fig = px.histogram(
-                data, 
-                x=data.columns[0],
-                title=f"Distribution: {question}",
-                nbins=20
-            )
-            return fig.to_json(), "histogram"
-        
-        return None, None
-    except Exception as e:
-        print(f"Error generating chart: {e}")
-        return None, None
+            yield _sse("done", {})
+        except Exception as e:
+            logger.exception("Error while streaming: %s", e)
+            yield _sse("error", {"stage": "pipeline", "detail": str(e)})
 
 # Sample visualization queries endpoint
 @app.get("/demo/sample-queries")
@@ -302,8 +671,9 @@ async def get_sample_queries():
 @app.get("/demo/total-sales")
 async def get_total_sales():
     """Demo endpoint: What is my total sales?"""
-    query = "SELECT SUM(total_sales) as total_sales FROM total_sales;"
-    result = db.execute_query(query)
+    query = DEMO_QUERIES["total-sales"]
+    with stage("execute"):
+        result = await db.execute_query_async(query)
     
     if isinstance(result, pd.DataFrame) and not result.empty:
         total_sales = result['total_sales'].iloc[0]
@@ -319,15 +689,9 @@ async def get_total_sales():
 @app.get("/demo/roas")
 async def get_roas():
     """Demo endpoint: Calculate the RoAS"""
-    query = """
-    SELECT 
-        SUM(ad_sales) as total_ad_sales,
-        SUM(ad_spend) as total_ad_spend,
-        ROUND(SUM(ad_sales) / SUM(ad_spend), 2) as roas
-    FROM ad_sales 
-    WHERE ad_spend > 0;
-    """
-    result = db.execute_query(query)
+    query = DEMO_QUERIES["roas"]
+    with stage("execute"):
+        result = await db.execute_query_async(query)
     
     if isinstance(result, pd.DataFrame) and not result.empty:
         roas = result['roas'].iloc[0]
@@ -350,17 +714,9 @@ async def get_roas():
 @app.get("/demo/highest-cpc")
 async def get_highest_cpc():
     """Demo endpoint: Which product had the highest CPC?"""
-    query = """
-    SELECT 
-        item_id,
-        ROUND(SUM(ad_spend) / SUM(clicks), 2) as cpc
-    FROM ad_sales 
-    WHERE clicks > 0 
-    GROUP BY item_id
-    ORDER BY cpc DESC 
-    LIMIT 1;
-    """
-    result = db.execute_query(query)
+    query = DEMO_QUERIES["highest-cpc"]
+    with stage("execute"):
+        result = await db.execute_query_async(query)
     
     if isinstance(result, pd.DataFrame) and not result.empty:
         item_id = result['item_id'].iloc[0]
@@ -0,0 +1,168 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from config import METRICS_WINDOW
+
+# Per-stage timing of requests and Prometheus exposition of the aggregates.
+#
+# The middleware opens a timings dict for each request; stage() adds the
+# elapsed milliseconds of each pipeline stage to it (repeated stages, such as
+# several repair rounds, accumulate). The same samples feed process-wide
+# summaries whose quantiles are computed over the last METRICS_WINDOW
+# observations, which is what capacity planning needs: how slow the recent
+# traffic is, per stage.
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+_timings_var = contextvars.ContextVar("timings", default=None)
+
+
+class Summary:
+    """Count, sum and sliding-window quantiles of observations, per label value"""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label, value):
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                series = self._series[label] = {
+                    "count": 0, "sum": 0.0, "samples": deque(maxlen=self.window)
+                }
+            series["count"] += 1
+            series["sum"] += value
+            series["samples"].append(value)
+
+    def snapshot(self):
+        """{label: (count, sum, {quantile: value})}"""
+        with self._lock:
+            series = {label: (s["count"], s["sum"], sorted(s["samples"]))
+                      for label, s in self._series.items()}
+        return {
+            label: (count, total, {q: _quantile(samples, q) for q in QUANTILES})
+            for label, (count, total, samples) in series.items()
+        }
+
+
+def _quantile(samples, q):
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+# Seconds spent in each pipeline stage, and in whole requests per route
+stage_seconds = Summary()
+request_seconds = Summary()
+
+# Tokens reported by Ollama: prompt (prefill) and generated
+llm_tokens = {"prompt": 0, "completion": 0, "calls": 0}
+_tokens_lock = threading.Lock()
+
+
+def start_request():
+    """Open the timings dict of the current request; returns a token for end_request()"""
+    return _timings_var.set({})
+
+
+def end_request(token):
+    _timings_var.reset(token)
+
+
+def current_timings():
+    """Stage timings of the current request in milliseconds, or None outside a request"""
+    return _timings_var.get()
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as pipeline stage ``name``"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def record_stage(name, seconds):
+    stage_seconds.observe(name, seconds)
+    timings = _timings_var.get()
+    if timings is not None:
+        timings[name] = round(timings.get(name, 0.0) + seconds * 1000, 2)
+
+
+def record_tokens(prompt_tokens, completion_tokens):
+    with _tokens_lock:
+        llm_tokens["prompt"] += prompt_tokens
+        llm_tokens["completion"] += completion_tokens
+        llm_tokens["calls"] += 1
+
+
+def server_timing(timings, total_seconds=None):
+    """Server-Timing header value for ``timings`` (milliseconds per stage)"""
+    entries = [f"{name};dur={duration:.2f}" for name, duration in timings.items()]
+    if total_seconds is not None:
+        entries.append(f"total;dur={total_seconds * 1000:.2f}")
+    return ", ".join(entries)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _render_summary(lines, name, help_text, label, summary):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} summary")
+    for value, (count, total, quantiles) in sorted(summary.snapshot().items()):
+        labels = f'{label}="{_escape(value)}"'
+        for q, seconds in quantiles.items():
+            lines.append(f'{name}{{{labels},quantile="{q}"}} {seconds:.6f}')
+        lines.append(f"{name}_sum{{{labels}}} {total:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {count}")
+
+
+def render_prometheus(caches=None, counters=None):
+    """Text exposition format of all metrics
+
+    ``caches`` maps cache names to LRUCache.stats() dictionaries and
+    ``counters`` maps metric names to (help, label name, {label value: count})
+    for application counters kept elsewhere.
+    """
+    lines = []
+    _render_summary(lines, "agent_stage_duration_seconds",
+                    "Time spent in each pipeline stage", "stage", stage_seconds)
+    _render_summary(lines, "agent_request_duration_seconds",
+                    "Time to produce the response, per route", "route", request_seconds)
+
+    with _tokens_lock:
+        tokens = dict(llm_tokens)
+    lines.append("# HELP agent_llm_tokens_total Tokens processed by the LLM")
+    lines.append("# TYPE agent_llm_tokens_total counter")
+    lines.append(f'agent_llm_tokens_total{{kind="prompt"}} {tokens["prompt"]}')
+    lines.append(f'agent_llm_tokens_total{{kind="completion"}} {tokens["completion"]}')
+    lines.append("# HELP agent_llm_calls_total LLM calls that reported token counts")
+    lines.append("# TYPE agent_llm_calls_total counter")
+    lines.append(f"agent_llm_calls_total {tokens['calls']}")
+
+    if caches:
+        for metric, key, kind, help_text in (
+            ("agent_cache_hits_total", "hits", "counter", "Cache hits"),
+            ("agent_cache_misses_total", "misses", "counter", "Cache misses"),
+            ("agent_cache_hit_ratio", "hit_ratio", "gauge", "Hits over lookups since start"),
+            ("agent_cache_entries", "size", "gauge", "Entries currently cached"),
+        ):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for cache, stats in caches.items():
+                lines.append(f'{metric}{{cache="{_escape(cache)}"}} {stats.get(key, 0)}')
+
+    for metric, (help_text, label, values) in (counters or {}).items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for value, count in values.items():
+            lines.append(f'{metric}{{{label}="{_escape(value)}"}} {count}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,208 @@
+import re
+from config import PROMPT_TOKEN_BUDGET, PROMPT_SCHEMA_PRUNING
+
+# Text-to-SQL prompt construction.
+#
+# Prompts are laid out as [static instructions][relevant schema][question].
+# The instruction block is byte-identical on every call, so Ollama can reuse
+# the already evaluated prefix; only the schema section and the question
+# change, and the schema section is limited to the tables the question is
+# about.
+
+SQL_INSTRUCTIONS = """
+You are an expert SQL analyst. Given the database schema below, convert the natural language question into a precise SQL query.
+
+CRITICAL RULES FOR SPECIFIC QUERIES:
+1. For "highest CPC" or "maximum CPC": Use ORDER BY cpc DESC LIMIT 1
+2. For "lowest CPC" or "minimum CPC": Use ORDER BY cpc ASC LIMIT 1
+3. For "highest RoAS": Use ORDER BY roas DESC LIMIT 1
+4. For "lowest RoAS": Use ORDER BY roas ASC LIMIT 1
+
+IMPORTANT RULES:
+1. Return ONLY the SQL query, no explanations, no "SQL" prefix, no markdown
+2. Write a single read-only SELECT (or WITH ... SELECT) statement
+3. Use proper SQLite syntax
+4. For RoAS calculations: SUM(ad_sales) / SUM(ad_spend) WHERE ad_spend > 0
+5. For CPC calculations: SUM(ad_spend) / SUM(clicks) WHERE clicks > 0
+6. For total sales: SUM(total_sales) FROM total_sales
+7. Use ROUND() with 2 decimal places for financial calculations
+8. End with a single semicolon
+9. Filter out zero denominators with WHERE clauses
+10. Do not generate multiple statements or fragments
+11. Only use the tables and columns listed in the schema
+
+Special calculation rules:
+    - For RoAS (Return on Ad Spend): Use SUM(ad_sales) / SUM(ad_spend)
+    - Always filter WHERE ad_spend > 0 for RoAS calculations
+    - Use ROUND() function with 2 decimal places for financial calculations
+"""
+
+TABLE_DESCRIPTIONS = {
+    "ad_sales": "Advertising sales data per product and day",
+    "total_sales": "Total sales data per product and day",
+    "eligibility": "Product advertising eligibility checks with status messages "
+                   "(eligibility is 1 or 0; eligibility_datetime_utc is 'YYYY-MM-DD HH:MM:SS')",
+    "eligibility_current": "Latest eligibility check of each product, one row per item_id; "
+                           "use it for current status questions instead of eligibility",
+    "eligibility_changes": "Eligibility checks where a product's status changed from its previous check "
+                           "(previous_eligibility is NULL for its first check)",
+}
+
+# Question words that point at a table even when no column name is mentioned
+TABLE_KEYWORDS = {
+    "ad_sales": {"ad", "ads", "advertising", "advertised", "campaign", "roas", "cpc", "ctr",
+                 "acos", "return", "cost", "click", "impression", "spend", "spent", "paid"},
+    "total_sales": {"total", "sale", "revenue", "order", "ordered", "organic", "sold", "unit"},
+    "eligibility": {"eligible", "eligibility", "ineligible", "status", "message", "reason",
+                    "qualified", "check"},
+    "eligibility_current": {"eligible", "eligibility", "ineligible", "status", "message", "reason",
+                            "qualified", "current", "currently", "now", "latest", "still", "today"},
+    "eligibility_changes": {"eligibility", "eligible", "ineligible", "status", "change", "changed",
+                            "became", "become", "flip", "flipped", "history", "when", "since"},
+}
+
+# Question words that imply a column even when its name is not mentioned
+COLUMN_KEYWORDS = {
+    "ad_sales": {"roas", "return", "acos"},
+    "ad_spend": {"roas", "cpc", "acos", "cost", "spent"},
+    "clicks": {"cpc", "ctr"},
+    "impressions": {"ctr", "view"},
+    "eligibility_datetime_utc": {"when", "latest", "time"},
+}
+
+# Rough size of a Mistral token in English/SQL text; used for budgeting only
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Approximate token count of ``text``"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _words(text):
+    """Lower-case words of ``text`` with a naive plural strip"""
+    words = set()
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        words.add(word)
+        if len(word) > 3 and word.endswith("s"):
+            words.add(word[:-1])
+    return words
+
+
+class PromptBuilder:
+    """Renders SQL prompts that include only the schema relevant to a question
+
+    Tables are ranked by how many question words match their name, columns
+    and keywords. When the rendered prompt exceeds ``token_budget``, columns
+    that neither join tables nor match the question are dropped first, then
+    the lowest ranked tables.
+    """
+
+    def __init__(self, schema_info, token_budget=PROMPT_TOKEN_BUDGET, prune=PROMPT_SCHEMA_PRUNING):
+        self.schema_info = schema_info
+        self.token_budget = token_budget
+        self.prune = prune
+        self.prefix = SQL_INSTRUCTIONS
+        self.prefix_tokens = estimate_tokens(self.prefix)
+
+        # Columns present in several tables are the join keys; never pruned
+        seen = {}
+        for columns in schema_info.values():
+            for column in columns:
+                seen[column] = seen.get(column, 0) + 1
+        self.key_columns = {column for column, count in seen.items() if count > 1}
+
+        self._table_words = {}
+        self._column_words = {}
+        for table, columns in schema_info.items():
+            words = _words(table.replace("_", " ")) | TABLE_KEYWORDS.get(table, set())
+            for column in columns:
+                column_words = _words(column.replace("_", " ")) | COLUMN_KEYWORDS.get(column, set())
+                self._column_words[(table, column)] = column_words
+                # "item" or "date" says nothing about which table is meant
+                if column not in self.key_columns:
+                    words |= column_words
+            self._table_words[table] = words
+
+    def rank_tables(self, question):
+        """Return [(table, score, matched_columns)] for tables the question refers to, best first"""
+        words = _words(question)
+        ranked = []
+        for table, columns in self.schema_info.items():
+            score = len(words & self._table_words[table])
+            if not score:
+                continue
+            matched = [c for c in columns if words & self._column_words[(table, c)]]
+            ranked.append((table, score, matched))
+        ranked.sort(key=lambda entry: (-entry[1], entry[0]))
+        return ranked
+
+    def build(self, question, failed_sql=None, error=None):
+        """Return (prompt, details) where details describes what was included
+
+        With ``failed_sql`` and ``error`` the prompt asks for a corrected
+        query; repair prompts carry the full schema, since a pruned table or
+        column may be what the failed query was missing.
+        """
+        repair = (failed_sql, error) if failed_sql is not None else None
+        prune = self.prune and repair is None
+        ranked = self.rank_tables(question) if prune else []
+        if not ranked:
+            # Nothing recognisable in the question: let the model see everything
+            ranked = [(table, 0, []) for table in self.schema_info]
+
+        selection = [
+            [table, list(self.schema_info[table]), matched]
+            for table, _, matched in ranked
+        ]
+        prompt = self._render(selection, question, repair)
+        trimmed_columns = False
+
+        if prune and estimate_tokens(prompt) > self.token_budget:
+            # Lowest ranked tables lose their unmatched columns first
+            for entry in reversed(selection):
+                table, columns, matched = entry
+                kept = [c for c in columns if c in self.key_columns or c in matched]
+                if kept and kept != columns:
+                    entry[1] = kept
+                    trimmed_columns = True
+                    prompt = self._render(selection, question, repair)
+                    if estimate_tokens(prompt) <= self.token_budget:
+                        break
+        while prune and estimate_tokens(prompt) > self.token_budget and len(selection) > 1:
+            selection.pop()
+            prompt = self._render(selection, question, repair)
+
+        tokens = estimate_tokens(prompt)
+        details = {
+            "tables": [entry[0] for entry in selection],
+            "estimated_tokens": tokens,
+            "prefix_tokens": self.prefix_tokens,
+            "token_budget": self.token_budget,
+            "columns_trimmed": trimmed_columns,
+            "over_budget": tokens > self.token_budget,
+        }
+        return prompt, details
+
+    def _render(self, selection, question, repair=None):
+        schema_text = ""
+        for table, columns, _ in selection:
+            schema_text += f"\nTable: {table}\n"
+            if table in TABLE_DESCRIPTIONS:
+                schema_text += f"Description: {TABLE_DESCRIPTIONS[table]}\n"
+            schema_text += f"Columns: {', '.join(columns)}\n"
+        repair_text = ""
+        if repair is not None:
+            repair_text = f"""
+Previous query:
+{repair[0]}
+
+The previous query failed with this error: {repair[1]}
+Write a corrected query that answers the question.
+"""
+        return f"""{self.prefix}
+Database Schema:
+{schema_text}
+Question: {question}
+{repair_text}
+Query:"""
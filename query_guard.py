@@ -0,0 +1,216 @@
+import re
+import sqlite3
+import time
+import pandas as pd
+from sql_utils import canonicalize_sql, statement_count, first_keyword
+
+# Limits applied to every query before and while it runs.
+#
+# Generated SQL is untrusted: it may write, run for minutes, join two fact
+# tables without a join condition or return millions of rows. The guard
+# rejects such queries up front where the statement or its plan gives them
+# away, and interrupts or caps them at runtime otherwise.
+
+READ_ONLY_KEYWORDS = ("SELECT", "WITH", "VALUES")
+
+# Authorizer actions a read-only query needs; everything else is denied
+_ALLOWED_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    getattr(sqlite3, "SQLITE_RECURSIVE", 33),
+}
+
+_SCAN = re.compile(r"^SCAN (\w+)")
+_SOURCE_START = re.compile(r"\b(?:FROM|JOIN)\s+", re.IGNORECASE)
+_SOURCE = re.compile(r"(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_SOURCE_SEPARATOR = re.compile(
+    r"\s*,\s*|\s+(?:NATURAL\s+)?(?:(?:LEFT|RIGHT|FULL)\s+(?:OUTER\s+)?|INNER\s+|CROSS\s+)?JOIN\s+",
+    re.IGNORECASE
+)
+_NOT_ALIASES = {
+    "ON", "USING", "WHERE", "GROUP", "ORDER", "HAVING", "LIMIT", "UNION", "EXCEPT",
+    "INTERSECT", "WINDOW", "NATURAL", "LEFT", "RIGHT", "FULL", "INNER", "CROSS", "JOIN",
+    "OUTER", "INDEXED", "NOT",
+}
+
+
+class QueryError(Exception):
+    """Structured query failure
+
+    ``code`` identifies the failure, ``retryable`` tells the client whether
+    sending the same request again may succeed. ``str()`` keeps the format of
+    the error strings execute_query used to return.
+    """
+
+    STATUS_CODES = {"timeout": 504, "busy": 503}
+
+    def __init__(self, code, message, retryable=False):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.retryable = retryable
+
+    @property
+    def status_code(self):
+        return self.STATUS_CODES.get(self.code, 400)
+
+    def to_dict(self):
+        return {"code": self.code, "message": self.message, "retryable": self.retryable}
+
+    def __str__(self):
+        return f"Error executing query: {self.message}"
+
+    @classmethod
+    def from_exception(cls, error):
+        """Classify an arbitrary database-layer exception"""
+        if isinstance(error, QueryError):
+            return error
+        message = str(error)
+        if isinstance(error, TimeoutError) or "locked" in message or "busy" in message:
+            return cls("busy", message, retryable=True)
+        if "not authorized" in message:
+            return cls("not_read_only", "Only read-only queries are allowed")
+        return cls("database_error", message)
+
+
+def _authorize(action, *args):
+    return sqlite3.SQLITE_OK if action in _ALLOWED_ACTIONS else sqlite3.SQLITE_DENY
+
+
+def _source_aliases(sql):
+    """Map each alias (and table name) in FROM/JOIN clauses to its table name"""
+    aliases = {}
+    for start in _SOURCE_START.finditer(sql):
+        position = start.end()
+        while True:
+            m = _SOURCE.match(sql, position)
+            if not m:
+                break
+            table, alias = m.group(1), m.group(2)
+            aliases[table.lower()] = table.lower()
+            if alias and alias.upper() not in _NOT_ALIASES:
+                aliases[alias.lower()] = table.lower()
+            # Skip an ON/USING condition up to the next comma or JOIN
+            separator = _SOURCE_SEPARATOR.search(sql, m.end())
+            if not separator or re.search(r"[()]|\b(?:WHERE|GROUP|ORDER|HAVING|LIMIT)\b",
+                                          sql[m.end():separator.start()], re.IGNORECASE):
+                break
+            position = separator.end()
+    return aliases
+
+
+class QueryGuard:
+    """Read-only, plan, time and row-count checks around query execution"""
+
+    def __init__(self, timeout=10.0, max_rows=100_000, max_join_scan_rows=1_000_000,
+                 progress_steps=1000, fetch_size=1000):
+        self.timeout = timeout
+        self.max_rows = max_rows
+        self.max_join_scan_rows = max_join_scan_rows
+        self.progress_steps = progress_steps
+        self.fetch_size = fetch_size
+
+    def check_statement(self, sql):
+        """Reject anything but a single read-only statement before it reaches SQLite"""
+        base = canonicalize_sql(sql)
+        if not base:
+            raise QueryError("empty_query", "The query is empty")
+        if statement_count(base) > 1:
+            raise QueryError("multiple_statements", "Only a single SQL statement is allowed")
+        if first_keyword(base) not in READ_ONLY_KEYWORDS:
+            raise QueryError("not_read_only", "Only read-only queries are allowed")
+
+    def check_plan(self, conn, sql, params, table_rows):
+        """Reject plans that nest full scans of large tables (cross joins)
+
+        ``table_rows`` maps table names to row counts. Full scans under the
+        same loop nest multiply; correlated subqueries multiply with the loop
+        that drives them. Scans of CTEs and subqueries have no known size and
+        are left to the runtime timeout.
+        """
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+        if not self.max_join_scan_rows:
+            return
+        aliases = _source_aliases(canonicalize_sql(sql))
+        nodes = {node_id: (parent, detail) for node_id, parent, _, detail in plan}
+
+        groups = {}
+        for node_id, (parent, detail) in nodes.items():
+            m = _SCAN.match(detail)
+            if not m:
+                continue
+            table = aliases.get(m.group(1).lower(), m.group(1).lower())
+            if table in table_rows:
+                groups.setdefault(parent, []).append(table_rows[table])
+
+        def loop_cost(parent):
+            cost, scans = 1, 0
+            for rows in groups.get(parent, []):
+                cost *= max(rows, 1)
+                scans += 1
+            parent_node = nodes.get(parent)
+            if parent_node and parent_node[1].startswith("CORRELATED"):
+                outer_cost, outer_scans = loop_cost(parent_node[0])
+                cost, scans = cost * outer_cost, scans + outer_scans
+            return cost, scans
+
+        for parent in groups:
+            cost, scans = loop_cost(parent)
+            if scans > 1 and cost > self.max_join_scan_rows:
+                raise QueryError(
+                    "expensive_plan",
+                    f"Query joins full table scans (~{cost:,} row combinations, limit "
+                    f"{self.max_join_scan_rows:,}); add a join condition on item_id/date or filter first"
+                )
+
+    def validate(self, conn, sql, params=None, table_rows=None):
+        """Compile ``sql`` and check its plan without running it; raises QueryError
+
+        Syntax errors, unknown tables or columns and rejected plans all show up
+        here, at the cost of a prepare instead of an execution.
+        """
+        self.check_statement(sql)
+        conn.set_authorizer(_authorize)
+        try:
+            self.check_plan(conn, sql, params, table_rows or {})
+        except sqlite3.Error as e:
+            raise QueryError.from_exception(e) from e
+        finally:
+            conn.set_authorizer(None)
+
+    def run(self, conn, sql, params=None, table_rows=None):
+        """Execute ``sql`` on ``conn`` within the guard's limits and return a DataFrame"""
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+
+        def check_deadline():
+            return deadline is not None and time.monotonic() > deadline
+
+        conn.set_authorizer(_authorize)
+        conn.set_progress_handler(check_deadline, self.progress_steps)
+        try:
+            self.check_plan(conn, sql, params, table_rows or {})
+            cursor = conn.execute(sql, params or ())
+            columns = [description[0] for description in cursor.description or ()]
+            rows = []
+            while True:
+                chunk = cursor.fetchmany(self.fetch_size)
+                if not chunk:
+                    break
+                rows.extend(chunk)
+                if self.max_rows and len(rows) > self.max_rows:
+                    cursor.close()
+                    raise QueryError(
+                        "too_many_rows",
+                        f"Query returned more than {self.max_rows:,} rows; aggregate or add a LIMIT"
+                    )
+        except sqlite3.OperationalError as e:
+            if "interrupted" in str(e):
+                raise QueryError(
+                    "timeout", f"Query exceeded the {self.timeout:g}s time limit", retryable=True
+                ) from e
+            raise
+        finally:
+            conn.set_progress_handler(None, 0)
+            conn.set_authorizer(None)
+        return pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
@@ -0,0 +1,57 @@
+import pandas as pd
+from config import RESULT_SUMMARY_ROWS, RESULT_SUMMARY_MAX_CHARS
+
+# Compact text rendering of query results for the answer-formatting prompt.
+#
+# Small results are sent as they are. Larger ones are reduced to the first
+# rows (queries order their most important rows first) plus per-column
+# statistics, so the prompt - and the LLM's prefill time - stays bounded no
+# matter how many rows the query returned.
+
+
+def _column_stats(df):
+    lines = []
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_bool_dtype(series):
+            counts = series.value_counts()
+            lines.append(f"- {column}: {int(counts.get(True, 0))} true, {int(counts.get(False, 0))} false")
+        elif pd.api.types.is_numeric_dtype(series):
+            values = series.dropna()
+            if values.empty:
+                lines.append(f"- {column}: all values missing")
+                continue
+            lines.append(
+                f"- {column}: sum={values.sum():,.2f}, mean={values.mean():,.2f}, "
+                f"min={values.min():,.2f}, max={values.max():,.2f}, non-null={len(values)}"
+            )
+        else:
+            values = series.dropna().astype(str)
+            top = values.value_counts().head(3)
+            common = ", ".join(f"{value!r} ({count})" for value, count in top.items())
+            span = f", range {values.min()} .. {values.max()}" if not values.empty else ""
+            lines.append(f"- {column}: {values.nunique()} distinct{span}; most common: {common or 'none'}")
+    return lines
+
+
+def summarize_result(df, total_rows=None, max_rows=RESULT_SUMMARY_ROWS, max_chars=RESULT_SUMMARY_MAX_CHARS):
+    """Render ``df`` for the formatting prompt within a bounded size
+
+    ``total_rows`` is the row count of the full result when ``df`` holds only
+    its first page.
+    """
+    total_rows = len(df) if total_rows is None else total_rows
+    if total_rows <= max_rows and len(df) <= max_rows:
+        text = df.to_string()
+    else:
+        partial = " (over the first {:,} rows)".format(len(df)) if len(df) < total_rows else ""
+        parts = [
+            f"{total_rows:,} rows in total; the first {min(max_rows, len(df))} are shown.",
+            df.head(max_rows).to_string(),
+            f"Column statistics{partial}:",
+            *_column_stats(df),
+        ]
+        text = "\n".join(parts)
+    if len(text) > max_chars:
+        text = text[:max_chars] + "\n... (truncated)"
+    return text
@@ -0,0 +1,277 @@
+import re
+
+# Pre-aggregated rollups of the fact tables.
+#
+# Every rollup stores additive components only (row counts and SUMs), once for
+# all rows and once per supported row filter, so ratios such as RoAS and CPC
+# can be recomputed exactly from the rollup with the same WHERE semantics as
+# the raw table.
+
+ROLLUP_PREFIX = "rollup_"
+
+FACT_TABLES = {
+    "ad_sales": {
+        "measures": ["ad_sales", "impressions", "ad_spend", "clicks", "units_sold"],
+        "filters": {"spend_pos": "ad_spend > 0", "clicks_pos": "clicks > 0",
+                    "impressions_pos": "impressions > 0"},
+    },
+    "total_sales": {
+        "measures": ["total_sales", "total_units_ordered"],
+        "filters": {"sales_pos": "total_sales > 0"},
+    },
+}
+
+GRAINS = {
+    "item": ("item_id",),
+    "day": ("date",),
+    "item_day": ("date", "item_id"),
+}
+
+
+def rollup_table_name(fact_table, grain):
+    return f"{ROLLUP_PREFIX}{fact_table}_{grain}"
+
+
+def _component(column, suffix):
+    return f"{column}__{suffix}" if suffix else column
+
+
+def rollup_ddl(fact_table, grain):
+    """CREATE TABLE ... AS SELECT statement for one rollup"""
+    spec = FACT_TABLES[fact_table]
+    dims = GRAINS[grain]
+    columns = list(dims) + ["COUNT(*) AS row_count"]
+    columns += [f"SUM({m}) AS {m}" for m in spec["measures"]]
+    for suffix, condition in spec["filters"].items():
+        columns.append(f"SUM(CASE WHEN {condition} THEN 1 ELSE 0 END) AS {_component('row_count', suffix)}")
+        columns += [
+            f"SUM(CASE WHEN {condition} THEN {m} END) AS {_component(m, suffix)}"
+            for m in spec["measures"]
+        ]
+    return (
+        f"CREATE TABLE {rollup_table_name(fact_table, grain)} AS "
+        f"SELECT {', '.join(columns)} FROM {fact_table} GROUP BY {', '.join(dims)}"
+    )
+
+
+def build_rollups(conn):
+    """(Re)build every rollup table from the fact tables; returns the table names"""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    built = []
+    for fact_table in FACT_TABLES:
+        if fact_table not in existing:
+            continue
+        for grain, dims in GRAINS.items():
+            name = rollup_table_name(fact_table, grain)
+            conn.execute(f"DROP TABLE IF EXISTS {name}")
+            conn.execute(rollup_ddl(fact_table, grain))
+            conn.execute(f"CREATE UNIQUE INDEX idx_{name} ON {name} ({', '.join(dims)})")
+            built.append(name)
+    conn.commit()
+    return built
+
+
+_STATEMENT = re.compile(
+    r"^\s*SELECT\s+(?P<select>.+?)\s+FROM\s+(?P<table>\w+)"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?"
+    r"(?:\s+GROUP\s+BY\s+(?P<group>.+?))?"
+    r"(?:\s+HAVING\s+(?P<having>.+?))?"
+    r"(?:\s+ORDER\s+BY\s+(?P<order>.+?))?"
+    r"(?:\s+LIMIT\s+(?P<limit>\d+(?:\s+OFFSET\s+\d+)?))?"
+    r"\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL
+)
+
+_DIM_PREDICATES = [
+    ("date", re.compile(r"date\s+BETWEEN\s+(?:'[^']*'|\?)\s+AND\s+(?:'[^']*'|\?)", re.I)),
+    ("date", re.compile(r"date\s*(?:=|==|!=|<>|>=|<=|>|<)\s*(?:'[^']*'|\?)", re.I)),
+    ("item_id", re.compile(r"item_id\s+IN\s*\(\s*(?:\d+|\?)(?:\s*,\s*(?:\d+|\?))*\s*\)", re.I)),
+    ("item_id", re.compile(r"item_id\s*(?:=|==|!=|<>|>=|<=|>|<)\s*(?:\d+|\?)", re.I)),
+]
+
+_AND = re.compile(r"\s+AND\s+", re.I)
+_ALIAS = re.compile(r"^(?P<expr>.+?[\w)])\s+(?:AS\s+)?(?P<alias>[A-Za-z_]\w*)$", re.I | re.S)
+_SUM = re.compile(r"SUM\s*\(\s*(\w+)\s*\)", re.I)
+_COUNT_STAR = re.compile(r"COUNT\s*\(\s*\*\s*\)", re.I)
+_IDENTIFIER = re.compile(r"[A-Za-z_]\w*")
+_SAFE_WORDS = {"ROUND", "CAST", "AS", "REAL", "FLOAT", "INTEGER", "NULLIF", "COALESCE"}
+_ORDER_WORDS = {"ASC", "DESC"}
+
+
+def _split_top_level(text, sep=","):
+    parts, depth, current, quoted = [], 0, [], False
+    for ch in text:
+        if ch == "'":
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        if ch == sep and depth == 0 and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+    parts.append("".join(current))
+    return [p.strip() for p in parts]
+
+
+class RollupRouter:
+    """Rewrites simple aggregate queries over the fact tables onto rollup tables
+
+    Only queries whose meaning is provably unchanged are routed: a single fact
+    table, SUM()/COUNT(*) aggregates, GROUP BY on item_id and/or date, and a
+    WHERE clause made of date/item_id comparisons plus at most one of the
+    filters stored in the rollup. Everything else returns None and runs on the
+    raw tables.
+    """
+
+    def __init__(self, fact_tables=FACT_TABLES):
+        self.fact_tables = fact_tables
+
+    def route(self, query, available_tables):
+        """Return (rewritten_query, rollup_table) or None"""
+        match = _STATEMENT.match(query)
+        if not match:
+            return None
+        if re.search(r"\b(SELECT|JOIN|UNION|DISTINCT|OVER|WITH)\b", query[match.start("select"):], re.I):
+            return None
+        if '"' in query or "`" in query or "[" in query:
+            return None
+
+        table = match.group("table").lower()
+        spec = self.fact_tables.get(table)
+        if spec is None:
+            return None
+
+        group_cols = []
+        if match.group("group"):
+            group_cols = [c.lower() for c in _split_top_level(match.group("group"))]
+            if not set(group_cols) <= {"item_id", "date"} or len(set(group_cols)) != len(group_cols):
+                return None
+
+        predicates, dims, suffix = self._parse_where(match.group("where"), spec)
+        if predicates is None:
+            return None
+        dims |= set(group_cols)
+        # Ungrouped totals use the per-day rollup: days grow far slower than items
+        grain = "day" if dims <= {"date"} else "item" if dims <= {"item_id"} else "item_day"
+        rollup = rollup_table_name(table, grain)
+        if rollup not in available_tables:
+            return None
+
+        select_items, aliases = [], set()
+        for item in _split_top_level(match.group("select")):
+            rewritten = self._rewrite_select_item(item, spec, suffix, group_cols)
+            if rewritten is None:
+                return None
+            select_items.append(rewritten[0])
+            if rewritten[1]:
+                aliases.add(rewritten[1].lower())
+
+        sql = f"SELECT {', '.join(select_items)} FROM {rollup}"
+        if suffix:
+            predicates.append(f"{_component('row_count', suffix)} > 0")
+        if predicates:
+            sql += " WHERE " + " AND ".join(predicates)
+        if group_cols:
+            sql += " GROUP BY " + ", ".join(group_cols)
+        if match.group("having"):
+            # Aliases may shadow raw columns inside HAVING, so only group columns are allowed
+            having = self._rewrite_expression(match.group("having"), spec, suffix, group_cols, set())
+            if having is None:
+                return None
+            sql += f" HAVING {having}"
+        if match.group("order"):
+            order_items = []
+            for item in _split_top_level(match.group("order")):
+                rewritten = self._rewrite_expression(item, spec, suffix, group_cols, aliases, _ORDER_WORDS)
+                if rewritten is None:
+                    return None
+                order_items.append(rewritten)
+            sql += " ORDER BY " + ", ".join(order_items)
+        if match.group("limit"):
+            sql += f" LIMIT {match.group('limit')}"
+        return sql + ";", rollup
+
+    def _parse_where(self, where, spec):
+        """Split the WHERE clause into kept predicates, referenced dims and filter suffix"""
+        if not where:
+            return [], set(), ""
+        filters = {
+            re.sub(r"\s+", "", condition.lower()): suffix
+            for suffix, condition in spec["filters"].items()
+        }
+        predicates, dims, suffix = [], set(), ""
+        position = 0
+        where = where.strip()
+        while position < len(where):
+            for dim, pattern in _DIM_PREDICATES:
+                m = pattern.match(where, position)
+                if m:
+                    predicates.append(m.group(0))
+                    dims.add(dim)
+                    break
+            else:
+                m = re.compile(r"(\w+)\s*>\s*0(?!\.?\d)").match(where, position)
+                key = re.sub(r"\s+", "", m.group(0).lower()) if m else None
+                if key not in filters or suffix:
+                    return None, None, None
+                suffix = filters[key]
+            position = m.end()
+            if position == len(where):
+                break
+            separator = _AND.match(where, position)
+            if not separator:
+                return None, None, None
+            position = separator.end()
+        return predicates, dims, suffix
+
+    def _rewrite_aggregates(self, expression, spec, suffix):
+        """Replace SUM(measure) and COUNT(*) with rollup components; None if unsupported"""
+        failed = []
+
+        def replace_sum(m):
+            column = m.group(1).lower()
+            if column not in spec["measures"]:
+                failed.append(column)
+                return m.group(0)
+            return f"SUM({_component(column, suffix)})"
+
+        rewritten = _SUM.sub(replace_sum, expression)
+        rewritten = _COUNT_STAR.sub(f"COALESCE(SUM({_component('row_count', suffix)}), 0)", rewritten)
+        return None if failed else rewritten
+
+    def _is_safe(self, rewritten, allowed_words):
+        """Every identifier left after removing rollup aggregates must be whitelisted"""
+        stripped = re.sub(r"COALESCE\(SUM\(\w+\), 0\)|SUM\(\w+\)", "0", rewritten)
+        stripped = re.sub(r"'[^']*'", "''", stripped)
+        for word in _IDENTIFIER.findall(stripped):
+            if word.upper() not in _SAFE_WORDS and word.lower() not in allowed_words:
+                return False
+        return re.fullmatch(r"[\w\s+\-*/().,'<>=!]*", stripped) is not None
+
+    def _rewrite_select_item(self, item, spec, suffix, group_cols):
+        if item.lower() in group_cols:
+            return item, None
+        alias_match = _ALIAS.match(item)
+        expression, alias = item, None
+        if alias_match and alias_match.group("alias").upper() not in _SAFE_WORDS:
+            expression, alias = alias_match.group("expr"), alias_match.group("alias")
+            if expression.lower() in group_cols:
+                return item, alias
+        if not (_SUM.search(expression) or _COUNT_STAR.search(expression)):
+            return None
+        rewritten = self._rewrite_aggregates(expression, spec, suffix)
+        if rewritten is None or not self._is_safe(rewritten, set()):
+            return None
+        # Keep the column name SQLite would have given the original expression
+        output_name = alias or item
+        return f'{rewritten} AS "{output_name}"', alias
+
+    def _rewrite_expression(self, expression, spec, suffix, group_cols, aliases, extra_words=()):
+        rewritten = self._rewrite_aggregates(expression, spec, suffix)
+        allowed = set(group_cols) | aliases | {w.lower() for w in extra_words}
+        if rewritten is None or not self._is_safe(rewritten, allowed):
+            return None
+        return rewritten
@@ -0,0 +1,99 @@
+import re
+
+# Single-quoted strings, double-quoted identifiers, comments, or anything else
+_SQL_TOKEN = re.compile(
+    r"'(?:[^']|'')*'"
+    r'|"(?:[^"]|"")*"'
+    r"|--[^\n]*"
+    r"|/\*.*?\*/"
+    r"|\s+"
+    r"|[^'\"\s-]+|-",
+    re.DOTALL
+)
+
+
+def canonicalize_sql(sql):
+    """Normalize SQL text for use as a cache key
+
+    Comments are dropped, runs of whitespace outside literals collapse to a
+    single space and trailing semicolons are removed. Case is preserved because
+    it changes result column names.
+    """
+    parts = []
+    for token in _SQL_TOKEN.findall(sql):
+        if token.isspace() or token.startswith("--") or token.startswith("/*"):
+            if parts and parts[-1] != " ":
+                parts.append(" ")
+        else:
+            parts.append(token)
+    return "".join(parts).strip().rstrip(";").rstrip()
+
+
+def _top_level_words(sql):
+    """Yield (token, depth) for tokens outside literals and comments"""
+    depth = 0
+    for token in _SQL_TOKEN.findall(sql):
+        if token.isspace() or token[0] in "'\"" or token.startswith("--") or token.startswith("/*"):
+            continue
+        yield token, depth
+        depth += token.count("(") - token.count(")")
+
+
+def _top_level_limit(sql):
+    """Tokens of the outermost LIMIT clause, or None when there is none"""
+    clause = None
+    for token, depth in _top_level_words(sql):
+        if depth == 0 and re.match(r"LIMIT\b", token, re.IGNORECASE):
+            clause = []
+        elif clause is not None and depth == 0:
+            clause.append(token.rstrip(";"))
+    return clause
+
+
+def has_top_level_limit(sql):
+    """True if the outermost statement already has a LIMIT clause"""
+    return _top_level_limit(sql) is not None
+
+
+def limit_sql(sql, limit, offset=0):
+    """Return ``sql`` restricted to ``limit`` rows starting at ``offset``
+
+    A LIMIT is appended when the query has none; a query that already limits
+    itself is wrapped so its own LIMIT still applies before paging. Statements
+    that are not queries are returned unchanged.
+    """
+    base = canonicalize_sql(sql)
+    first = next(_top_level_words(base), ("", 0))[0].upper()
+    if first not in ("SELECT", "WITH", "VALUES"):
+        return sql
+    limit, offset = int(limit), int(offset)
+    clause = f"LIMIT {limit}" + (f" OFFSET {offset}" if offset else "")
+    existing = _top_level_limit(base)
+    if existing is not None:
+        # "LIMIT 10" within the cap already does the job, and stays routable
+        if not offset and len(existing) == 1 and existing[0].isdigit() and int(existing[0]) <= limit:
+            return sql
+        return f"SELECT * FROM ({base}) {clause};"
+    return f"{base} {clause};"
+
+
+def statement_count(sql):
+    """Number of statements in ``sql``, ignoring empty ones"""
+    count, pending = 0, False
+    for token, _ in _top_level_words(sql):
+        for piece in re.split(r"(;)", token):
+            if piece == ";":
+                count += pending
+                pending = False
+            elif piece:
+                pending = True
+    return count + pending
+
+
+def first_keyword(sql):
+    """Upper-cased first word of ``sql``, skipping comments and opening parentheses"""
+    for token, _ in _top_level_words(sql):
+        word = token.lstrip("(")
+        if word:
+            return re.match(r"\w*", word).group(0).upper()
+    return ""
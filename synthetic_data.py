@@ -0,0 +1,134 @@
+import os
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+
+# Synthetic data at a multiple of the size of the real exports.
+#
+# Every synthetic item copies the day-by-day rows of a source item (its
+# "template") with one random factor per row applied to all metrics, so
+# zero-inflation, heavy tails, refunds and per-row ratios such as CPC and
+# RoAS keep the source distributions. An item uses the same template in all
+# three tables, which keeps table coverage (not every item has ads or sales)
+# and cross-table correlation. Extra days repeat the source calendar after
+# its last day. Rows are generated and appended to the CSVs one block of
+# items at a time, so memory use does not grow with the scale.
+
+# Columns that are copied from the template without noise
+TEXT_COLUMNS = {"date", "item_id", "eligibility_datetime_utc", "eligibility", "message"}
+
+
+class TableProfile:
+    """Rows of one source table indexed by (template item, source day)"""
+
+    def __init__(self, df, date_column):
+        self.data = df.reset_index(drop=True)
+        self.columns = list(df.columns)
+        self.date_column = date_column
+        self.numeric = [c for c in self.columns if c not in TEXT_COLUMNS]
+        self.items = np.sort(df["item_id"].unique())
+
+        # "2025-06-04 8:50:07" -> day "2025-06-04" and time of day " 8:50:07"
+        dates = self.data[date_column].astype(str)
+        day_text = dates.str.slice(0, 10)
+        self.time_part = dates.str.slice(10).values
+        self.source_dates = sorted(pd.to_datetime(day_text.unique()))
+        self.span_days = (self.source_dates[-1] - self.source_dates[0]).days + 1
+        day_position = {d: i for i, d in enumerate(self.source_dates)}
+        self.day_index = pd.to_datetime(day_text).map(day_position).values.astype(int)
+        self.lookup = None
+
+    def build_lookup(self, template_ids):
+        """lookup[template, day] = source row or -1 for the item ids in ``template_ids``
+
+        Restated rows share an (item, day) cell; the last one wins, as in the loader.
+        """
+        position = {item: i for i, item in enumerate(template_ids)}
+        self.lookup = np.full((len(template_ids), len(self.source_dates)), -1)
+        items = self.data["item_id"].map(position).values.astype(int)
+        self.lookup[items, self.day_index] = np.arange(len(self.data))
+
+    def date_strings(self, days):
+        """Calendar of ``days`` days: the source days, then repeats shifted by the source span"""
+        n = len(self.source_dates)
+        return np.array([
+            (self.source_dates[j % n] + timedelta(days=(j // n) * self.span_days)).strftime("%Y-%m-%d")
+            for j in range(days)
+        ], dtype=object)
+
+
+def _sample_block(profile, templates, first_item, dates, rng, noise):
+    """DataFrame of the rows of synthetic items ``first_item..`` using ``templates``"""
+    days = len(dates)
+    source_day = np.arange(days) % len(profile.source_dates)
+    source_rows = profile.lookup[templates[:, None], source_day[None, :]]
+    present = source_rows >= 0
+    rows = source_rows[present]
+    item_ids = np.broadcast_to((first_item + np.arange(len(templates)))[:, None], source_rows.shape)[present]
+    day_ids = np.broadcast_to(np.arange(days)[None, :], source_rows.shape)[present]
+
+    block = {}
+    factor = rng.lognormal(0.0, noise, len(rows))
+    for column in profile.columns:
+        if column == profile.date_column:
+            block[column] = dates[day_ids] + profile.time_part[rows]
+        elif column == "item_id":
+            block[column] = item_ids
+        elif column in profile.numeric:
+            values = profile.data[column].values[rows] * factor
+            if pd.api.types.is_integer_dtype(profile.data[column]):
+                block[column] = np.rint(values).astype(np.int64)
+            else:
+                block[column] = np.round(values, 2)
+        else:
+            block[column] = profile.data[column].values[rows]
+    return pd.DataFrame(block, columns=profile.columns)
+
+
+def generate(sources, out_dir, scale=10, days_scale=1, seed=0, block_items=20_000, noise=0.25):
+    """Write scaled copies of the source CSVs to ``out_dir``; returns {file path: rows}
+
+    ``sources`` maps each source CSV path to the name of its date column.
+    Item counts are multiplied by ``scale`` and day counts by ``days_scale``.
+    The first block of synthetic items reuses the source items in order, so
+    scale 1 reproduces the source catalog with noise.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    profiles = {}
+    for path, date_column in sources.items():
+        df = pd.read_csv(path)
+        if "eligibility" in df.columns:
+            df["eligibility"] = df["eligibility"].map(lambda v: "TRUE" if str(v).upper() == "TRUE" else "FALSE")
+        profiles[path] = TableProfile(df, date_column)
+
+    # Items present in any table; each synthetic item follows one of them everywhere
+    template_ids = np.unique(np.concatenate([p.items for p in profiles.values()]))
+    for profile in profiles.values():
+        profile.build_lookup(template_ids)
+    n_items = len(template_ids) * scale
+
+    outputs = {}
+    calendars = {}
+    for path, profile in profiles.items():
+        out_path = os.path.join(out_dir, os.path.basename(path))
+        # Header only; blocks are appended below
+        pd.DataFrame(columns=profile.columns).to_csv(out_path, index=False)
+        outputs[out_path] = 0
+        calendars[path] = profile.date_strings(len(profile.source_dates) * days_scale)
+
+    for first_item in range(0, n_items, block_items):
+        count = min(block_items, n_items - first_item)
+        positions = np.arange(first_item, first_item + count)
+        templates = np.where(
+            positions < len(template_ids),
+            positions % len(template_ids),
+            rng.integers(0, len(template_ids), count)
+        )
+        for path, profile in profiles.items():
+            out_path = os.path.join(out_dir, os.path.basename(path))
+            block = _sample_block(profile, templates, first_item, calendars[path], rng, noise)
+            block.to_csv(out_path, mode="a", header=False, index=False)
+            outputs[out_path] += len(block)
+    return outputs